@@ -0,0 +1,198 @@
+import dataclasses
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import networkx as nx
+import numpy as np
+import PCN_Sim
+import Yao_MPC
+
+# Microbenchmarks of the simulation hot paths
+#
+# Every benchmark runs one operation over a list of pre-drawn inputs (cycled) for at least
+# MIN_TIME seconds and reports operations per second, then runs it again under tracemalloc
+# for the peak memory one operation allocates on top of what is already live. Graph
+# benchmarks run on PCN_Sim.create_pcn networks of GRAPH_SIZES nodes with CHANNELS_PER_NODE
+# channels per node (the scripts' 400 channels for 100 nodes) and MALICIOUS of them malicious.
+#
+#   yao_python / yao_numpy  Yao_MPC engines for every Highest in HIGHEST_SIZES
+#   find_path_bfs           random pairs, with EXCLUSION_SIZES random edges excluded
+#   find_valid_path_mpc     find_valid_path_with_mpc with the default MPC caches (warm after
+#                           the first pass over the inputs)
+#   simulate_htlc           simulate_htlc_payment on pre-found paths (balances drift by the
+#                           amounts, which does not change the work per payment)
+#   settle_htlc             settle_htlc_payment on the same paths
+#   update_ratings          one full rating round after warm-up payments of the rating
+#                           strategy; the dense store up to DENSE_RATINGS_MAX_NODES, sparse above
+#
+# The report is JSON with sorted keys and one entry per benchmark in a fixed order, each with a
+# "key" (name and parameters) so two runs can be compared with compare_reports:
+#   python Benchmark_Suite.py report.json [baseline.json]
+
+GRAPH_SIZES = (100, 1000, 10000)
+CHANNELS_PER_NODE = 4
+MALICIOUS = 0.1
+HIGHEST_SIZES = (100, 1000, 10000, 100000)
+EXCLUSION_SIZES = (0, 10, 100, 1000)
+DENSE_RATINGS_MAX_NODES = 1000
+INPUTS = 200 # pre-drawn inputs per benchmark
+MIN_TIME = 0.5 # seconds per benchmark
+MEMORY_CALLS = 20 # operations run under tracemalloc
+SEED = 0
+REGRESSION_TOLERANCE = 0.2 # compare_reports flags ops/sec more than 20% lower, peak memory more than 20% higher
+
+
+# ops/sec and peak memory of op(x) over the inputs
+def measure(op, inputs, min_time=MIN_TIME):
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for x in inputs:
+            op(x)
+        calls += len(inputs)
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peak = 0
+    for x in inputs[:MEMORY_CALLS]:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        op(x)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {"ops_per_sec": round(calls / elapsed, 1), "peak_memory_bytes": peak, "calls": calls}
+
+
+def _entry(name, params, result):
+    key = name + "".join(f"/{k}={v}" for k, v in params.items())
+    return {"key": key, "name": name, "params": params, **result}
+
+
+def bench_yao(highest_sizes=HIGHEST_SIZES, min_time=MIN_TIME):
+    entries = []
+    rng = random.Random(SEED)
+    for engine in ("python", "numpy"):
+        protocol = Yao_MPC.get_engine(engine)
+        for highest in highest_sizes:
+            balance = highest // 2
+            inputs = [(rng.randint(1, balance), rng.randint(1, 500)) for _ in range(INPUTS)]
+            result = measure(lambda x: protocol(x[0], balance, highest, 40, x[1]), inputs, min_time)
+            entries.append(_entry(f"yao_{engine}", {"highest": highest}, result))
+    return entries
+
+
+def make_network(num_nodes, ratings=False, rating_store="dense"):
+    params = PCN_Sim.SimParams(num_nodes=num_nodes, num_channels=CHANNELS_PER_NODE * num_nodes,
+                               rating_store=rating_store)
+    random.seed(SEED)
+    G = PCN_Sim.create_pcn(params, ratings)
+    PCN_Sim.make_malicious(G, MALICIOUS)
+    return G, params
+
+
+def _pairs(num_nodes, rng, count=INPUTS):
+    return [tuple(rng.sample(range(num_nodes), 2)) for _ in range(count)]
+
+
+def bench_graph(num_nodes, exclusion_sizes=EXCLUSION_SIZES, min_time=MIN_TIME):
+    entries = []
+    rng = random.Random(SEED)
+    G, params = make_network(num_nodes)
+    pairs = _pairs(num_nodes, rng)
+    edges = list(G.edges())
+
+    for size in exclusion_sizes:
+        if size > len(edges):
+            continue
+        excluded = set(rng.sample(edges, size))
+        result = measure(lambda x: PCN_Sim.find_path_bfs(G, x[0], x[1], excluded), pairs, min_time)
+        entries.append(_entry("find_path_bfs", {"nodes": num_nodes, "excluded": size}, result))
+
+    inputs = [(s, r, rng.randint(1, params.max_send_amount)) for s, r in pairs]
+    result = measure(lambda x: PCN_Sim.find_valid_path_with_mpc(G, x[0], x[1], x[2], params), inputs, min_time)
+    entries.append(_entry("find_valid_path_mpc", {"nodes": num_nodes}, result))
+
+    payments = []
+    for s, r in pairs:
+        try:
+            payments.append((nx.shortest_path(G, s, r), PCN_Sim.generate_preimage()))
+        except nx.NetworkXNoPath:
+            pass
+    result = measure(lambda x: PCN_Sim.simulate_htlc_payment(G, x[0], x[1], 1), payments, min_time)
+    entries.append(_entry("simulate_htlc", {"nodes": num_nodes}, result))
+    result = measure(lambda x: PCN_Sim.settle_htlc_payment(G, x[0], x[1], 1), payments, min_time)
+    entries.append(_entry("settle_htlc", {"nodes": num_nodes}, result))
+
+    rating_store = "dense" if num_nodes <= DENSE_RATINGS_MAX_NODES else "sparse"
+    G, params = make_network(num_nodes, ratings=True, rating_store=rating_store)
+    params = dataclasses.replace(params, transactions=2 * num_nodes, incremental_rating_updates=False)
+    PCN_Sim.run_payments(G, "rating", params, PCN_Sim.random_payments(num_nodes, params))
+    result = measure(lambda x: PCN_Sim.update_ratings(G, params), [None], min_time)
+    entries.append(_entry("update_ratings", {"nodes": num_nodes, "store": rating_store}, result))
+    return entries
+
+
+def run_benchmarks(graph_sizes=GRAPH_SIZES, highest_sizes=HIGHEST_SIZES, min_time=MIN_TIME):
+    entries = bench_yao(highest_sizes, min_time)
+    for num_nodes in graph_sizes:
+        entries.extend(bench_graph(num_nodes, min_time=min_time))
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "networkx": nx.__version__,
+            "machine": platform.machine(),
+        },
+        "settings": {
+            "channels_per_node": CHANNELS_PER_NODE,
+            "malicious": MALICIOUS,
+            "min_time": min_time,
+            "seed": SEED,
+        },
+        "benchmarks": entries,
+    }
+
+
+def save_report(path, report):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Benchmarks of new that got slower or use more memory than in old, beyond the tolerance:
+# [(key, metric, old value, new value)]
+def compare_reports(old, new, tolerance=REGRESSION_TOLERANCE):
+    old_entries = {entry["key"]: entry for entry in old["benchmarks"]}
+    regressions = []
+    for entry in new["benchmarks"]:
+        before = old_entries.get(entry["key"])
+        if before is None:
+            continue
+        if entry["ops_per_sec"] < before["ops_per_sec"] * (1 - tolerance):
+            regressions.append((entry["key"], "ops_per_sec", before["ops_per_sec"], entry["ops_per_sec"]))
+        if entry["peak_memory_bytes"] > before["peak_memory_bytes"] * (1 + tolerance) + 1024:
+            regressions.append((entry["key"], "peak_memory_bytes", before["peak_memory_bytes"], entry["peak_memory_bytes"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    report = run_benchmarks()
+    for entry in report["benchmarks"]:
+        print(f"{entry['key']:<45} {entry['ops_per_sec']:>12.1f} ops/s {entry['peak_memory_bytes'] / 1024:>10.1f} KiB peak")
+    if len(sys.argv) > 1:
+        save_report(sys.argv[1], report)
+        print("Report written to", sys.argv[1])
+    if len(sys.argv) > 2:
+        regressions = compare_reports(load_report(sys.argv[2]), report)
+        for key, metric, before, after in regressions:
+            print(f"Regression {key} {metric}: {before} -> {after}")
+        print("Regressions against", sys.argv[2] + ":", len(regressions))
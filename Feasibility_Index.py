@@ -0,0 +1,121 @@
+import Router
+
+# Per-node balance index for rejecting infeasible payments before any search
+#
+# A payment over a single path needs an edge out of the sender and an edge into the receiver
+# that both hold at least the amount, so
+#   max_out[sender] >= amount and max_in[receiver] >= amount
+# is necessary. The index keeps the largest outbound and inbound balance of every node and is
+# updated by the settlement functions after every settled payment (PCN_Sim.settle_htlc_payment /
+# simulate_htlc_payment): a credited edge can only raise a maximum (O(1)), a debited edge is only
+# rescanned (O(degree)) if it held the maximum. Checking is O(1).
+# Mode "local" adds a bound from the two-hop neighborhood (a local cut around each endpoint):
+# some edge sender -> x with enough balance must continue (x is the receiver or max_out[x] is
+# enough), and the same backwards from the receiver. Both are upper bounds on what any route
+# search could find, so a rejected payment has no valid path. With MPC, malicious nodes are not
+# checked, so a search could still return a path the payment then fails on; the prefilter drops
+# those payments before they are attempted.
+
+MODES = ("degree", "local")
+
+
+class FeasibilityIndex:
+    def __init__(self, G, mode="degree"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown feasibility prefilter {mode!r}, expected one of {MODES}")
+        router = Router.get_router(G)
+        self.mode = mode
+        self.succ, self.pred = router.succ, router.pred
+        self.adj = G.succ  # live edge attributes, like Router.BFSRouter.adj
+        self.max_out = [self._scan_out(u) for u in range(router.num_nodes)]
+        self.max_in = [self._scan_in(v) for v in range(router.num_nodes)]
+        self.checks = 0
+        self.rejected = 0  # by max_out / max_in
+        self.rejected_local = 0  # by the two-hop bound
+        self.rescans = 0
+
+    def _scan_out(self, u):
+        adj_u = self.adj[u]
+        return max((adj_u[v]['balance'] for v in self.succ[u]), default=float('-inf'))
+
+    def _scan_in(self, v):
+        adj = self.adj
+        return max((adj[u][v]['balance'] for u in self.pred[v]), default=float('-inf'))
+
+    # After a settled payment: every hop (u, v) was debited and its reverse (v, u) credited by amount
+    def update_path(self, path, amount):
+        adj, max_out, max_in = self.adj, self.max_out, self.max_in
+        for u, v in zip(path, path[1:]):
+            debited = adj[u][v]['balance']
+            if debited + amount == max_out[u]:
+                max_out[u] = self._scan_out(u)
+                self.rescans += 1
+            if debited + amount == max_in[v]:
+                max_in[v] = self._scan_in(v)
+                self.rescans += 1
+            credited = adj[v][u]['balance']
+            if credited > max_out[v]:
+                max_out[v] = credited
+            if credited > max_in[u]:
+                max_in[u] = credited
+
+    def feasible(self, sender, receiver, amount):
+        self.checks += 1
+        if self.max_out[sender] < amount or self.max_in[receiver] < amount:
+            self.rejected += 1
+            return False
+        if self.mode == "local" and not self._local(sender, receiver, amount):
+            self.rejected_local += 1
+            return False
+        return True
+
+    def _local(self, sender, receiver, amount):
+        adj, max_out, max_in = self.adj, self.max_out, self.max_in
+        adj_sender = adj[sender]
+        if not any(adj_sender[x]['balance'] >= amount and (x == receiver or max_out[x] >= amount)
+                   for x in self.succ[sender]):
+            return False
+        return any(adj[y][receiver]['balance'] >= amount and (y == sender or max_in[y] >= amount)
+                   for y in self.pred[receiver])
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "rejected_local": self.rejected_local,
+            "rescans": self.rescans,
+        }
+
+
+# The incrementally kept maxima equal a fresh scan; returns the number of mismatches
+def check_index(index):
+    return (sum(index.max_out[u] != index._scan_out(u) for u in range(len(index.max_out))) +
+            sum(index.max_in[v] != index._scan_in(v) for v in range(len(index.max_in))))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    import PCN_Sim
+    import Workload
+
+    # Same payments with and without the prefilter; amounts up to 10x max_send_amount so that
+    # depleted nodes show up. Searches and MPC checks skipped are the differences to "off".
+    for strategy in PCN_Sim.STRATEGIES:
+        for mode in (None, "degree", "local"):
+            params = PCN_Sim.SimParams(transactions=10000, feasibility_prefilter=mode)
+            random.seed(0)
+            G = PCN_Sim.create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+            PCN_Sim.make_malicious(G, 0.1)
+            payments = Workload.generate_workload(params.num_nodes, params.transactions, 10 * params.max_send_amount, seed=1)
+            start = time.perf_counter()
+            successful, failed = PCN_Sim.run_payments(G, strategy, params, PCN_Sim.workload_payments(payments))
+            elapsed = time.perf_counter() - start
+            router = Router.get_router(G)
+            row = (f"{strategy:>10} {str(mode):>6}: success {successful:5d} failed {failed:5d}"
+                   f" | searches {router.searches:6d} MPC checks {G.graph.get('mpc_checks', 0):6d} | {elapsed:.2f} s")
+            if mode:
+                index = G.graph['feasibility']
+                row += f" | rejected {index.rejected} + {index.rejected_local} local, index mismatches {check_index(index)}"
+            print(row)
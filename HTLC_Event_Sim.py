@@ -0,0 +1,364 @@
+import dataclasses
+import heapq
+import math
+import random
+import time
+import PCN_Sim
+import Timer_Wheel
+
+# Discrete-event HTLC simulation: many payments in flight at the same time
+#
+# PCN_Sim.simulate_htlc_payment locks, reveals and settles a payment in one call. Here every
+# payment moves hop by hop on a heap of timed events, so payments compete for the same
+# channel liquidity while their funds are locked:
+#   arrive   payments arrive as a Poisson process (arrival_rate per second of simulated time)
+#            and are routed on the current balances, locked funds already taken out
+#   lock     hop i is locked hop_latency after hop i-1; a hop whose balance is checked by the
+#            strategy (every hop without MPC, hops towards honest nodes with MPC) and no longer
+#            covers the amount fails the payment (contention)
+#   reveal   the preimage travels back one hop per hop_latency, crediting the reverse channel;
+#            a malicious node refuses to reveal it and the payment fails as in simulate_htlc_payment
+#   refund   after a failure the locks are released backwards, one hop per hop_latency, and the
+#            credits already made are taken back
+#   expiry   every payment's HTLCs expire cltv_expiry seconds after the first lock (CLTV). With
+#            malicious_behavior "jam" a malicious node does not refuse the preimage but holds the
+#            HTLC, keeping every lock of the payment until the expiry releases them all at once.
+#            Expiries live in a Timer_Wheel.TimerWheel (O(1) schedule/cancel), not in the event
+#            heap; settled and refunded payments cancel theirs.
+# Locked liquidity (all locks) and jammed liquidity (locks held by jammers) are sampled every
+# sample_interval seconds into `timeline`.
+# Sender, receiver and amount are drawn from `random` in the same order as run_simulation and
+# arrival times from a separate generator, so with arrivals far apart the results are exactly
+# those of run_simulation (see check_sequential_limit).
+
+ARRIVAL_RATE = 100.0 # payments per second of simulated time
+HOP_LATENCY = 0.05 # seconds per hop, for every lock, reveal and refund step
+MALICIOUS_BEHAVIOR = "refuse" # "refuse": refuse the preimage at once, "jam": hold the HTLC until it expires
+CLTV_EXPIRY = 10.0 # seconds from the first lock until the payment's HTLCs expire
+TIMER_TICK = 0.01 # resolution of the expiry timer wheel, seconds
+SAMPLE_INTERVAL = 1.0 # seconds between samples of locked liquidity
+
+ARRIVE, LOCK, REVEAL, REFUND = range(4)
+
+
+class Payment:
+    def __init__(self, path, amount, arrival):
+        self.path = path
+        self.amount = amount
+        self.arrival = arrival
+        self.credited = []  # reverse edges credited by the reveal so far
+        self.hops_locked = 0  # forward hops locked so far
+        self.locked_hops = 0  # forward hops locked and not yet settled by a reveal
+        self.timer = None  # expiry handle in the timer wheel
+        self.jammer = None  # malicious node holding the HTLC
+        self.done = False  # settled, failed or expired: its remaining events are ignored
+
+
+class EventSimulator:
+    def __init__(self, G, strategy, params, arrival_rate=ARRIVAL_RATE, hop_latency=HOP_LATENCY, seed=None,
+                 malicious_behavior=MALICIOUS_BEHAVIOR, cltv_expiry=CLTV_EXPIRY, timer_tick=TIMER_TICK,
+                 sample_interval=SAMPLE_INTERVAL):
+        if malicious_behavior not in ("refuse", "jam"):
+            raise ValueError(f"Unknown malicious_behavior {malicious_behavior!r}, expected 'refuse' or 'jam'")
+        if params.feasibility_prefilter:
+            # hops are locked and settled here one by one, the index only follows whole payments
+            raise ValueError("feasibility_prefilter is not supported by the event simulator")
+        self.G = G
+        self.params = params
+        self.use_mpc = strategy in ("mpc", "mpc_rating")
+        self.use_ratings = strategy in ("rating", "mpc_rating")
+        self.arrival_rate = arrival_rate
+        self.hop_latency = hop_latency
+        self.arrivals = random.Random(seed)  # inter-arrival times only
+        self.malicious_behavior = malicious_behavior
+        self.cltv_expiry = cltv_expiry
+        self.wheel = Timer_Wheel.TimerWheel(timer_tick)
+
+        self.events = []
+        self.sequence = 0  # FIFO order between events at the same time
+        self.now = 0.0
+
+        self.successful = 0
+        self.failed = 0  # local routing failures + failed HTLCs, as in run_simulation
+        self.unrouted = 0
+        self.contention = 0
+        self.malicious = 0
+        self.jams = 0
+        self.expired = 0
+        self.events_processed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.locked = 0  # amount currently locked in forward hops
+        self.peak_locked = 0
+        self.locked_area = 0.0  # integral of locked over simulated time
+        self.last_change = 0.0
+        self.jammed = 0  # amount currently locked by HTLCs held by jammers
+        self.peak_jammed = 0
+        self.jammed_area = 0.0
+        self.sample_interval = sample_interval
+        self.next_sample = 0.0
+        self.timeline = []  # (time, locked, jammed) every sample_interval
+        self.completion_times = []
+
+    def schedule(self, at, kind, payment, hop):
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, payment, hop))
+
+    def _set_locked(self, delta, jammed_delta=0):
+        while self.next_sample <= self.now:
+            self.timeline.append((round(self.next_sample, 6), self.locked, self.jammed))
+            self.next_sample += self.sample_interval
+        elapsed = self.now - self.last_change
+        self.locked_area += self.locked * elapsed
+        self.jammed_area += self.jammed * elapsed
+        self.last_change = self.now
+        self.locked += delta
+        self.jammed += jammed_delta
+        self.peak_locked = max(self.peak_locked, self.locked)
+        self.peak_jammed = max(self.peak_jammed, self.jammed)
+
+    # the cached MPC answers of a channel are stale once its balance moves
+    def _balance_changed(self, u, v):
+        if 'prepared_tables' in self.G.graph:
+            self.G.graph['prepared_tables'].invalidate_path((u, v))
+            self.G.graph['liquidity_cache'].bump_path((u, v))
+
+    def _checks_balance(self, v):
+        return not self.use_mpc or self.G.nodes[v]['honest']
+
+    def arrive(self):
+        G, params = self.G, self.params
+        num_nodes = G.number_of_nodes()
+        node1 = random.randint(0, num_nodes - 1)
+        node2 = random.randint(0, num_nodes - 1)
+        while node1 == node2:
+            node2 = random.randint(0, num_nodes - 1)
+        amount = random.randint(1, params.max_send_amount)
+        if self.use_ratings and params.rating_gossip and random.random() < params.node_rating_update_percentage:
+            PCN_Sim.update_ratings(G, params)
+
+        if self.use_mpc:
+            path = PCN_Sim.find_valid_path_with_mpc(G, node1, node2, amount, params, self.use_ratings)
+        else:
+            path, local_failures = PCN_Sim.find_valid_path_HTLC_Helper(G, node1, node2, amount, params, self.use_ratings)
+            self.failed += local_failures
+        if path is None:
+            self.unrouted += 1
+            return
+        PCN_Sim.generate_preimage()  # same random draws as run_simulation
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.lock(Payment(path, amount, self.now), 0)
+
+    def lock(self, payment, hop):
+        if payment.done:
+            return
+        G = self.G
+        u, v = payment.path[hop], payment.path[hop + 1]
+        if self._checks_balance(v) and G[u][v]['balance'] < payment.amount:
+            # another payment took the liquidity since this one was routed
+            self.contention += 1
+            self.fail(payment, hop)
+            return
+        G[u][v]['balance'] -= payment.amount
+        self._balance_changed(u, v)
+        self._set_locked(payment.amount)
+        payment.hops_locked += 1
+        payment.locked_hops += 1
+        if hop == 0:
+            self.wheel.skip_to(self.now)
+            payment.timer = self.wheel.schedule(self.now + self.cltv_expiry, payment)
+        if hop + 2 < len(payment.path):
+            self.schedule(self.now + self.hop_latency, LOCK, payment, hop + 1)
+        else:
+            self.schedule(self.now + self.hop_latency, REVEAL, payment, hop)
+
+    def reveal(self, payment, hop):
+        if payment.done:
+            return
+        G = self.G
+        sender, receiver = payment.path[hop], payment.path[hop + 1]
+        if not G.nodes[receiver]['honest'] and self.malicious_behavior == "jam":
+            # malicious node holds the HTLC: every lock stays until the expiry
+            self.jams += 1
+            payment.jammer = receiver
+            self._set_locked(0, payment.locked_hops * payment.amount)
+            return
+        if not G.nodes[receiver]['honest']:
+            # malicious node refuses to reveal the preimage
+            self.malicious += 1
+            if self.use_ratings:
+                PCN_Sim.rate_nodes(G, payment.path[0], [receiver], -1)
+            self.fail(payment, len(payment.path) - 1)
+            return
+        G[receiver][sender]['balance'] += payment.amount
+        self._balance_changed(receiver, sender)
+        self._set_locked(-payment.amount)  # this hop's lock is settled
+        payment.locked_hops -= 1
+        payment.credited.append((receiver, sender))
+        if hop > 0:
+            self.schedule(self.now + self.hop_latency, REVEAL, payment, hop - 1)
+            return
+        self.successful += 1
+        self.in_flight -= 1
+        payment.done = True
+        self.wheel.cancel(payment.timer)
+        self.completion_times.append(self.now - payment.arrival)
+        if self.use_ratings:
+            PCN_Sim.rate_nodes(G, payment.path[0], payment.path[1:], 1)
+
+    # Hops 0..locked_hops-1 are locked; the settled ones are unlocked again by taking back their
+    # credit, the others are refunded backwards one hop at a time
+    def fail(self, payment, locked_hops):
+        G = self.G
+        self.failed += 1
+        self.in_flight -= 1
+        payment.done = True
+        if payment.timer is not None:
+            self.wheel.cancel(payment.timer)
+        settled = len(payment.credited)
+        for x, y in payment.credited:
+            G[x][y]['balance'] -= payment.amount
+            self._balance_changed(x, y)
+        self._set_locked(settled * payment.amount)
+        if locked_hops > 0:
+            self.schedule(self.now + self.hop_latency, REFUND, payment, locked_hops - 1)
+
+    def refund(self, payment, hop):
+        G = self.G
+        u, v = payment.path[hop], payment.path[hop + 1]
+        G[u][v]['balance'] += payment.amount
+        self._balance_changed(u, v)
+        self._set_locked(-payment.amount)
+        if hop > 0:
+            self.schedule(self.now + self.hop_latency, REFUND, payment, hop - 1)
+
+    # CLTV expiry: the credits made so far are taken back and every lock is released at once
+    def expire(self, payment):
+        G = self.G
+        self.expired += 1
+        self.failed += 1
+        self.in_flight -= 1
+        payment.done = True
+        if payment.jammer is not None:
+            self._set_locked(0, -payment.locked_hops * payment.amount)
+            if self.use_ratings:
+                PCN_Sim.rate_nodes(G, payment.path[0], [payment.jammer], -1)
+        for x, y in payment.credited:
+            G[x][y]['balance'] -= payment.amount
+            self._balance_changed(x, y)
+        for u, v in zip(payment.path, payment.path[1:payment.hops_locked + 1]):
+            G[u][v]['balance'] += payment.amount
+            self._balance_changed(u, v)
+        self._set_locked(-payment.locked_hops * payment.amount)
+
+    def run(self, transactions):
+        next_arrival = self.arrivals.expovariate(self.arrival_rate)
+        arrived = 0
+        self.schedule(next_arrival, ARRIVE, None, 0)
+        handlers = {LOCK: self.lock, REVEAL: self.reveal, REFUND: self.refund}
+        wheel = self.wheel
+        while self.events or wheel.pending:
+            # expiries due before the next event go first; ticks without timers are jumped over
+            if wheel.pending and (not self.events or wheel.next_time() <= self.events[0][0]):
+                wheel.skip_to(self.events[0][0] if self.events else math.inf)
+                if not self.events or wheel.next_time() <= self.events[0][0]:
+                    self.now = max(self.now, wheel.next_time())
+                    for payment in wheel.step():
+                        self.expire(payment)
+                    continue
+            at, _, kind, payment, hop = heapq.heappop(self.events)
+            self.now = at
+            self.events_processed += 1
+            if kind == ARRIVE:
+                self.arrive()
+                arrived += 1
+                if arrived < transactions:
+                    self.schedule(at + self.arrivals.expovariate(self.arrival_rate), ARRIVE, None, 0)
+            else:
+                handlers[kind](payment, hop)
+        self._set_locked(0)
+
+    def stats(self):
+        total = self.successful + self.failed
+        completions = sorted(self.completion_times)
+        return {
+            "success_rate": round(self.successful / total * 100, 1) if total else 0,
+            "successful": self.successful,
+            "failed": self.failed,
+            "unrouted": self.unrouted,
+            "contention_failures": self.contention,
+            "malicious_failures": self.malicious,
+            "jammed_htlcs": self.jams,
+            "expired_htlcs": self.expired,
+            "simulated_seconds": round(self.now, 3),
+            "throughput": round(self.successful / self.now, 2) if self.now else 0,
+            "peak_in_flight": self.peak_in_flight,
+            "mean_locked": round(self.locked_area / self.now, 1) if self.now else 0,
+            "peak_locked": self.peak_locked,
+            "mean_jammed": round(self.jammed_area / self.now, 1) if self.now else 0,
+            "peak_jammed": self.peak_jammed,
+            "median_completion": round(completions[len(completions) // 2], 3) if completions else 0,
+            "events": self.events_processed,
+        }
+
+
+# One sweep point with concurrent payments: fresh network, params.transactions arrivals.
+# Returns the stats of the run plus the wall-clock time it took.
+def run_concurrent(strategy, malicious_percentage, params=None, seed=None, arrival_rate=ARRIVAL_RATE,
+                   hop_latency=HOP_LATENCY, malicious_behavior=MALICIOUS_BEHAVIOR, cltv_expiry=CLTV_EXPIRY,
+                   verbose=True):
+    if strategy not in PCN_Sim.STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {PCN_Sim.STRATEGIES}")
+    if params is None:
+        params = PCN_Sim.SimParams()
+    if seed is not None:
+        random.seed(seed)
+    G = PCN_Sim.create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+    PCN_Sim.make_malicious(G, malicious_percentage)
+
+    start = time.perf_counter()
+    simulator = EventSimulator(G, strategy, params, arrival_rate, hop_latency, seed, malicious_behavior, cltv_expiry)
+    simulator.run(params.transactions)
+    stats = simulator.stats()
+    stats["wall_seconds"] = round(time.perf_counter() - start, 3)
+    if verbose:
+        print("------", strategy, "| Malicious:", malicious_percentage, "(" + malicious_behavior + ")",
+              "| arrival rate:", arrival_rate, "/s ------")
+        for name, value in stats.items():
+            print(f"{name}: {value}")
+    return stats
+
+
+# With arrivals far apart no two payments overlap, so every strategy must give run_simulation's
+# success rate for the same seed
+def check_sequential_limit(transactions=1500, seed=7, malicious_percentage=0.2):
+    params = dataclasses.replace(PCN_Sim.SimParams(), transactions=transactions)
+    mismatches = 0
+    for strategy in PCN_Sim.STRATEGIES:
+        expected = PCN_Sim.run_simulation(strategy, malicious_percentage, params, seed, verbose=False)
+        stats = run_concurrent(strategy, malicious_percentage, params, seed, arrival_rate=0.001, verbose=False)
+        if stats["success_rate"] != expected:
+            mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    print("Strategies differing from run_simulation with sequential arrivals:", check_sequential_limit())
+
+    params = dataclasses.replace(PCN_Sim.SimParams(), transactions=5000)
+    print("arrival rate | strategy   | success % | contention | peak in flight | mean locked | payments/s (sim) | wall s")
+    for arrival_rate in (1, 10, 100, 1000):
+        for strategy in ("baseline", "mpc"):
+            stats = run_concurrent(strategy, 0.1, params, seed=0, arrival_rate=arrival_rate, verbose=False)
+            print(f"{arrival_rate:12} | {strategy:10} | {stats['success_rate']:9} | {stats['contention_failures']:10} |"
+                  f" {stats['peak_in_flight']:14} | {stats['mean_locked']:11} | {stats['throughput']:16} | {stats['wall_seconds']}")
+
+    # Jamming: malicious nodes hold HTLCs until they expire instead of refusing them
+    print("behavior | strategy   | success % | jammed HTLCs | contention | mean locked | mean jammed | peak jammed")
+    for malicious_behavior in ("refuse", "jam"):
+        for strategy in ("baseline", "mpc"):
+            stats = run_concurrent(strategy, 0.1, params, seed=0, arrival_rate=100,
+                                   malicious_behavior=malicious_behavior, verbose=False)
+            print(f"{malicious_behavior:>8} | {strategy:10} | {stats['success_rate']:9} | {stats['jammed_htlcs']:12} |"
+                  f" {stats['contention_failures']:10} | {stats['mean_locked']:11} | {stats['mean_jammed']:11} | {stats['peak_jammed']}")
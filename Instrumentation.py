@@ -0,0 +1,183 @@
+import json
+import time
+import Router
+
+# Per-phase timers and counters of PCN_Sim.run_payments
+#
+# Put an Instruments in G.graph['instruments'] (or pass instruments= to PCN_Sim.run_simulation)
+# and run_payments calls the timed wrappers from attach() instead of the plain functions:
+#   route   find_valid_path_HTLC_Helper / find_valid_path_with_mpc, the whole path search
+#   search  the router's searches inside route (find_path_bfs, and the oracle searches)
+#   checks  route minus search: hop balance checks, MPC checks and rating checks
+#   settle  settle_htlc_payment / simulate_htlc_payment
+#   gossip  update_ratings
+# The counters are taken from what the simulation counts anyway (router, MPC caches, rating
+# store), as the difference between attach and detach, plus what the wrappers see of the
+# results (refunds, rating writes). Without an Instruments nothing is wrapped, so the only cost
+# is one G.graph lookup per run_payments call.
+#
+# Several Instruments (e.g. one per strategy, with labels) are exported together with
+# save_json and save_prometheus (text exposition format, one sample per line).
+
+PHASES = ("route", "search", "settle", "gossip")
+COUNTERS = (
+    "payments",
+    "searches",          # full searches of the router
+    "repairs",           # incremental search repairs (incremental_repair)
+    "route_cache_hits",  # first candidates answered by the route cache (route_cache)
+    "hops_checked",      # hops of found paths checked for balance / liquidity
+    "mpc_checks",        # private liquidity checks asked for
+    "mpc_cache_hits",    # of those answered by the liquidity cache
+    "mpc_tables_built",  # prepared Yao tables built
+    "settled",           # payments that completed
+    "refunds",           # payments whose locks were refunded
+    "refunded_hops",     # locks refunded
+    "rating_writes",     # ratings written after payments
+    "ratings_adopted",   # ratings adopted from neighbors by gossip rounds
+)
+
+
+class Instruments:
+    def __init__(self, **labels):
+        self.labels = labels
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.start = None
+
+    def timed(self, phase, function):
+        seconds, calls, clock = self.seconds, self.calls, time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[phase] += clock() - start
+                calls[phase] += 1
+        return wrapper
+
+    # Cumulative counters the simulation keeps on G
+    def _totals(self, G):
+        router = Router.get_router(G)
+        totals = {
+            "searches": router.searches,
+            "repairs": router.repairs,
+            "hops_checked": router.hops_checked,
+            "mpc_checks": G.graph.get('mpc_checks', 0),
+            "mpc_cache_hits": 0,
+            "mpc_tables_built": 0,
+            "route_cache_hits": G.graph['route_cache'].hits if 'route_cache' in G.graph else 0,
+        }
+        if 'liquidity_cache' in G.graph:
+            totals["mpc_cache_hits"] = G.graph['liquidity_cache'].hits
+            totals["mpc_tables_built"] = G.graph['prepared_tables'].builds
+        return totals
+
+    # Timed versions of the route, settle and gossip functions of one run_payments call
+    def attach(self, G, route, settle, gossip):
+        self.start = self._totals(G)
+        router = Router.get_router(G)
+        router.shortest_path = self.timed("search", router.shortest_path)  # instance attributes,
+        router.widest_path = self.timed("search", router.widest_path)      # removed again by detach
+        counters = self.counters
+
+        def settle_counted(G, path, preimage, amount, use_ratings=False, *args):
+            settled = settle(G, path, preimage, amount, use_ratings, *args)
+            if settled:
+                counters["settled"] += 1
+            else:
+                counters["refunds"] += 1
+                counters["refunded_hops"] += len(path) - 1
+            if use_ratings:
+                counters["rating_writes"] += len(path) - 1 if settled else 1
+            return settled
+
+        def gossip_counted(G, params):
+            store = G.graph.get('ratings')
+            if store is not None:
+                before = store.adopted
+                gossip(G, params)
+                counters["ratings_adopted"] += store.adopted - before
+            else:
+                before = sum(len(G.nodes[n]['rating']) for n in G)
+                gossip(G, params)
+                counters["ratings_adopted"] += sum(len(G.nodes[n]['rating']) for n in G) - before
+
+        return self.timed("route", route), self.timed("settle", settle_counted), self.timed("gossip", gossip_counted)
+
+    def detach(self, G, payments):
+        router = Router.get_router(G)
+        del router.shortest_path, router.widest_path
+        for name, total in self._totals(G).items():
+            self.counters[name] += total - self.start[name]
+        self.counters["payments"] += payments
+        self.start = None
+
+    # Phase times with "checks" (route minus search) and per-payment ratios
+    def summary(self):
+        seconds = dict(self.seconds)
+        seconds["checks"] = max(seconds["route"] - seconds["search"], 0.0)
+        payments = self.counters["payments"]
+        per_payment = {name: self.counters[name] / payments if payments else 0.0
+                       for name in ("searches", "hops_checked", "mpc_checks", "refunds", "rating_writes")}
+        return {"labels": self.labels, "seconds": seconds, "calls": dict(self.calls),
+                "counters": dict(self.counters), "per_payment": per_payment}
+
+
+def save_json(path, instruments):
+    with open(path, "w") as f:
+        json.dump([i.summary() for i in instruments], f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}" if labels else ""
+
+
+def save_prometheus(path, instruments, prefix="pcn"):
+    summaries = [i.summary() for i in instruments]
+    lines = [f"# HELP {prefix}_phase_seconds_total Time spent in each simulation phase",
+             f"# TYPE {prefix}_phase_seconds_total counter"]
+    for summary in summaries:
+        for phase, seconds in summary["seconds"].items():
+            lines.append(f"{prefix}_phase_seconds_total{_labels(summary['labels'], phase=phase)} {seconds:.6f}")
+    lines += [f"# HELP {prefix}_phase_calls_total Calls of each simulation phase",
+              f"# TYPE {prefix}_phase_calls_total counter"]
+    for summary in summaries:
+        for phase, calls in summary["calls"].items():
+            lines.append(f"{prefix}_phase_calls_total{_labels(summary['labels'], phase=phase)} {calls}")
+    for name in COUNTERS:
+        lines += [f"# TYPE {prefix}_{name}_total counter"]
+        for summary in summaries:
+            lines.append(f"{prefix}_{name}_total{_labels(summary['labels'])} {summary['counters'][name]}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import PCN_Sim
+
+    params = PCN_Sim.SimParams(transactions=3000, rating_gossip=True)
+    instruments = []
+    for strategy in PCN_Sim.STRATEGIES:
+        instrument = Instruments(strategy=strategy)
+        PCN_Sim.run_simulation(strategy, 0.1, params, seed=0, verbose=False, instruments=instrument)
+        instruments.append(instrument)
+        summary = instrument.summary()
+        print(f"{strategy:>10}: " + " | ".join(f"{phase} {seconds:.3f} s" for phase, seconds in summary["seconds"].items()))
+        print(" " * 12 + " | ".join(f"{name} {value:.2f}/payment" for name, value in summary["per_payment"].items()))
+
+    # Cost of the instrumentation: the same run with and without it
+    for instrument in (None, Instruments()):
+        start = time.perf_counter()
+        PCN_Sim.run_simulation("mpc_rating", 0.1, params, seed=0, verbose=False, instruments=instrument)
+        print("mpc_rating", "with" if instrument else "without", f"instruments: {time.perf_counter() - start:.3f} s")
+
+    directory = tempfile.mkdtemp()
+    save_json(os.path.join(directory, "phases.json"), instruments)
+    save_prometheus(os.path.join(directory, "phases.prom"), instruments)
+    print("Written to", directory)
@@ -0,0 +1,154 @@
+import csv
+import networkx as nx
+import numpy as np
+import os
+import random
+import time
+import PCN_Graph
+
+# Synthetic PCN following the real Lightning Network node list in Nodes.csv
+#
+# Nodes.csv has one row per Lightning node with its ChannelCount and total Capacity (sats).
+# Only those two columns are streamed into NumPy arrays (no per-row Python objects are kept).
+# The channel graph is then generated so that degrees and capacities follow the file:
+#   1. every node opens one channel to a peer picked proportionally to ChannelCount
+#      (preferential attachment, so nobody is isolated)
+#   2. the remaining channels are drawn with both endpoints proportional to ChannelCount
+#      (expected degree of a node ~ its ChannelCount), rejecting self-loops and duplicates
+#   3. a channel between u and v gets capacity min(Capacity_u / ChannelCount_u,
+#      Capacity_v / ChannelCount_v), split into the two directional balances at a random point
+# Balances are expressed in simulation units: by default the median channel capacity is
+# mapped to MAX_CHANNEL_BALANCE, the scale the scripts use for create_pcn.
+
+NODES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Nodes.csv")  # next to this module, from any working directory
+MAX_CHANNEL_BALANCE = 1000
+
+
+# Streams (ChannelCount, Capacity) of every node in the file into two int64 arrays
+def load_node_stats(path=NODES_CSV):
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        count_col = header.index("ChannelCount")
+        capacity_col = header.index("Capacity")
+        values = np.fromiter((int(row[col]) for row in reader for col in (count_col, capacity_col)), dtype=np.int64)
+    values = values.reshape(-1, 2)
+    keep = (values[:, 0] > 0) & (values[:, 1] > 0)
+    return values[keep, 0], values[keep, 1]
+
+
+# Unique unordered channels (u < v) for the node weights, as two int arrays
+def draw_channels(weights, num_channels, rng, max_rounds=50):
+    n = len(weights)
+    p = weights / weights.sum()
+    # 1. one channel per node towards a preferentially attached peer
+    u = np.arange(n)
+    v = rng.choice(n, size=n, p=p)
+    keys = np.empty(0, dtype=np.int64)
+    for _ in range(max_rounds):
+        ok = u != v
+        low, high = np.minimum(u[ok], v[ok]), np.maximum(u[ok], v[ok])
+        keys = np.unique(np.concatenate([keys, low.astype(np.int64) * n + high]))
+        missing = num_channels - len(keys)
+        if missing <= 0:
+            break
+        # 2. remaining channels with both endpoints proportional to ChannelCount
+        u = rng.choice(n, size=missing, p=p)
+        v = rng.choice(n, size=missing, p=p)
+    if len(keys) > num_channels:
+        # step 1 alone can give more unique channels than requested on tiny samples
+        keys = rng.permutation(keys)[:num_channels]
+    return keys // n, keys % n
+
+
+# Generates the channel graph, returns (num_nodes, u, v, balance_uv, balance_vu)
+def generate_channels(num_nodes=None, channel_counts=None, capacities=None, path=NODES_CSV,
+                      max_balance=MAX_CHANNEL_BALANCE, capacity_unit=None, seed=None):
+    if channel_counts is None or capacities is None:
+        channel_counts, capacities = load_node_stats(path)
+    if seed is None:
+        seed = random.getrandbits(32)  # follow the scripts' random state
+    rng = np.random.default_rng(seed)
+
+    total_nodes = len(channel_counts)
+    if num_nodes is not None and num_nodes < total_nodes:
+        chosen = rng.choice(total_nodes, size=num_nodes, replace=False)
+        channel_counts, capacities = channel_counts[chosen], capacities[chosen]
+        fraction = num_nodes / total_nodes
+    else:
+        fraction = 1.0
+    n = len(channel_counts)
+
+    # every channel is counted at both of its ends; in a sample only `fraction` of the peers exist
+    num_channels = max(n - 1, int(round(channel_counts.sum() * fraction / 2)))
+    num_channels = min(num_channels, n * (n - 1) // 2)
+    u, v = draw_channels(channel_counts.astype(np.float64), num_channels, rng)
+
+    per_channel = capacities / channel_counts
+    capacity = np.minimum(per_channel[u], per_channel[v])
+    if capacity_unit is None:
+        capacity_unit = np.median(capacity) / max_balance
+    capacity = capacity / capacity_unit
+    split = rng.random(len(capacity))
+    balance_uv = np.maximum(1, np.round(capacity * split)).astype(np.int64)
+    balance_vu = np.maximum(1, np.round(capacity * (1 - split))).astype(np.int64)
+    return n, u, v, balance_uv, balance_vu
+
+
+# Lightning-like PCN as the networkx graph used by the scripts (same attributes as create_pcn)
+def create_lightning_pcn(num_nodes=None, ratings=False, **kwargs):
+    n, u, v, balance_uv, balance_vu = generate_channels(num_nodes, **kwargs)
+    G = nx.DiGraph()
+    for i in range(n):
+        if ratings:
+            G.add_node(i, honest=True, rating={})
+        else:
+            G.add_node(i, honest=True)
+    for a, b, ab, ba in zip(u.tolist(), v.tolist(), balance_uv.tolist(), balance_vu.tolist()):
+        # Each direction has its own balance
+        G.add_edge(a, b, balance=ab)
+        G.add_edge(b, a, balance=ba)
+    return G
+
+
+# Same topology as an array-backed PCN_Graph.CSRGraph
+def create_lightning_csr(num_nodes=None, **kwargs):
+    n, u, v, balance_uv, balance_vu = generate_channels(num_nodes, **kwargs)
+    tails = np.column_stack([u, v]).ravel()
+    heads = np.column_stack([v, u]).ravel()
+    balances = np.column_stack([balance_uv, balance_vu]).ravel()
+    return PCN_Graph.CSRGraph.from_arrays(n, tails, heads, balances)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    channel_counts, capacities = load_node_stats()
+    print(f"Loaded {len(channel_counts)} nodes from {NODES_CSV} in {time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    g = create_lightning_csr(channel_counts=channel_counts, capacities=capacities, seed=0)
+    print(f"Generated {g.num_edges // 2} channels in {time.perf_counter() - start:.3f} s")
+    degrees = np.diff(g.indptr)
+    print("Degree: file median", int(np.median(channel_counts)), "max", int(channel_counts.max()),
+          "| graph median", int(np.median(degrees)), "max", int(degrees.max()))
+    print("Balance: median", int(np.median(g.balance)), "max", int(g.balance.max()))
+
+    import PCN_Sim
+    params = PCN_Sim.SimParams()
+    random.seed(0)
+    PCN_Graph.make_malicious(g, 0.1)
+    for name, find_path in (("baseline", PCN_Graph.find_valid_path_HTLC_Helper),
+                            ("MPC", PCN_Graph.find_valid_path_with_mpc)):
+        successful = 0
+        payments = 1000
+        start = time.perf_counter()
+        for _ in range(payments):
+            sender, receiver = random.sample(range(g.num_nodes), 2)
+            amount = random.randint(1, params.max_send_amount)
+            path = find_path(g, sender, receiver, amount, params)
+            if isinstance(path, tuple):
+                path = path[0]
+            if path is not None and PCN_Graph.simulate_htlc_payment(g, path, amount):
+                successful += 1
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {payments / elapsed:8.1f} payments/s, success {successful / payments * 100:.1f} %")
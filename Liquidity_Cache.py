@@ -0,0 +1,71 @@
+# Edge-level cache of MPC liquidity-check results
+#
+# For every channel (u, v) we remember, for its current balance, the largest amount the
+# channel is known to cover and the smallest amount it is known NOT to cover.
+# Because "balance >= amount" is monotone in amount, any amount <= covers is a hit (True)
+# and any amount >= not_covers is a hit (False); only amounts in between need a new MPC.
+# simulate_htlc_payment bumps every edge whose balance it touches, which drops its stale
+# bounds, so memory is bounded by max_entries.
+
+from collections import OrderedDict
+
+
+class LiquidityCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (u, v) -> [covers, not_covers], kept in LRU order
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Called whenever G[u][v]['balance'] changes
+    def bump(self, u, v):
+        self.entries.pop((u, v), None)
+
+    # Bumps both directions of every hop on a payment path
+    def bump_path(self, path):
+        for u, v in zip(path, path[1:]):
+            self.bump(u, v)
+            self.bump(v, u)
+
+    # Returns True/False if the answer is implied by the cached bounds, None otherwise
+    def lookup(self, u, v, amount):
+        key = (u, v)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if amount <= entry[0]:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return True
+            if amount >= entry[1]:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return False
+        self.misses += 1
+        return None
+
+    # Stores the result of an MPC check, tightening the bounds of the current balance
+    def record(self, u, v, amount, result):
+        key = (u, v)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = [float('-inf'), float('inf')]
+            self.entries[key] = entry
+        if result:
+            entry[0] = max(entry[0], amount)
+        else:
+            entry[1] = min(entry[1], amount)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+        }
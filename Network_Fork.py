@@ -0,0 +1,210 @@
+import networkx as nx
+import random
+import time
+import tracemalloc
+import PCN_Sim
+import Rating_Store
+import Router
+import Workload
+
+# Forks of one network, so the four strategies run on identical state
+#
+# Every script builds its own random network, so their curves come from different graphs.
+# Here one network is built per sweep point (create_pcn + make_malicious) and every strategy
+# gets a fork of it. Topology and honest flags never change during a run, so a fork shares
+# them: the node attribute dicts (unless they hold rating dicts) and the router's adjacency
+# lists (Router.BFSRouter.fork). The balances are copy-on-write per node: a fork starts with
+# networkx adjacency dicts pointing at the base graph's rows and copies a row (with its edge
+# attribute dicts, in the original order) the first time the simulation looks at it. The
+# ratings are copied (RatingStore.copy, or the rating dicts). The base graph must not change
+# while it has forks.
+# networkx has no public way to build a DiGraph on top of existing dicts, so a fork sets the
+# private _node, _succ/_adj and _pred of a new DiGraph. check_networkx_internals verifies on a
+# tiny graph that the installed networkx reads nodes, edges and neighbors from exactly those
+# dicts; it runs once at import and fork refuses to run if it fails.
+# All strategies replay the same pre-drawn payments (Workload), since `random` is also drawn
+# from by MPC table builds, preimages and rating gossip and would give them different streams.
+
+
+# Successor dicts of a fork: a node's row (and its edge attribute dicts) is copied from the
+# base graph the first time it is looked up, untouched rows stay shared with the base.
+# Iterating without lookups (items/values) sees the shared rows, which hold the same values.
+class CopyOnWriteAdjacency(dict):
+    def __init__(self, base):
+        super().__init__(base)
+        self.copied = set()
+
+    def __getitem__(self, u):
+        row = dict.__getitem__(self, u)
+        if u not in self.copied:
+            self.copied.add(u)
+            row = {v: dict(attributes) for v, attributes in row.items()}
+            dict.__setitem__(self, u, row)
+        return row
+
+    def get(self, u, default=None):
+        return self[u] if u in self else default
+
+
+# Predecessor dicts of a fork, built on lookup from the fork's successor rows so both views
+# share the same edge attribute dicts
+class ForkPredecessors(dict):
+    def __init__(self, base_pred, succ):
+        super().__init__(base_pred)
+        self.succ = succ
+        self.built = set()
+
+    def __getitem__(self, v):
+        row = dict.__getitem__(self, v)
+        if v not in self.built:
+            self.built.add(v)
+            row = {u: self.succ[u][v] for u in row}
+            dict.__setitem__(self, v, row)
+        return row
+
+    def get(self, v, default=None):
+        return self[v] if v in self else default
+
+
+# Empty DiGraph on top of the given node, successor and predecessor dicts
+def _digraph_over(nodes, succ, pred):
+    F = nx.DiGraph()
+    F._node = nodes
+    F._succ = F._adj = succ
+    F._pred = pred
+    return F
+
+
+# The installed networkx keeps a DiGraph in _node, _succ/_adj and _pred and reads every view
+# from them, so _digraph_over gives a working graph
+def check_networkx_internals():
+    G = nx.DiGraph()
+    G.add_nodes_from([(0, {'honest': True}), (1, {'honest': False})])
+    G.add_edge(0, 1, balance=5)
+    if not all(isinstance(getattr(G, name, None), dict) for name in ("_node", "_succ", "_adj", "_pred")):
+        return False
+    edge = {'balance': 5}
+    F = _digraph_over({0: {'honest': True}, 1: {'honest': False}}, {0: {1: edge}, 1: {}}, {0: {}, 1: {0: edge}})
+    return (F.number_of_nodes() == 2 and list(F.edges(data='balance')) == [(0, 1, 5)] and F.has_edge(0, 1)
+            and F[0][1] is edge and F.succ[0][1] is edge and F.adj[0][1] is edge and F.pred[1][0] is edge
+            and list(F.neighbors(0)) == [1] and list(F.predecessors(1)) == [0] and F.nodes[1]['honest'] is False)
+
+
+NETWORKX_INTERNALS_OK = check_networkx_internals()
+
+
+def fork(G, ratings=False, params=None):
+    if not NETWORKX_INTERNALS_OK:
+        raise RuntimeError(f"networkx {nx.__version__} stores DiGraphs differently than Network_Fork expects")
+    has_dicts = G.number_of_nodes() and 'rating' in G.nodes[0]
+    if has_dicts or (ratings and params is not None and params.rating_store == "dict" and 'ratings' not in G.graph):
+        nodes = {n: {'honest': attributes['honest'], 'rating': dict(attributes.get('rating', {}))}
+                 for n, attributes in G.nodes.items()}
+    else:
+        nodes = dict(G.nodes.items())  # honest flags are shared, nothing writes them after make_malicious
+    succ = CopyOnWriteAdjacency(G._succ)  # the rows themselves, G.succ would wrap each in a view
+    F = _digraph_over(nodes, succ, ForkPredecessors(G._pred, succ))
+    F.graph.update((key, value) for key, value in G.graph.items()
+                   if key not in ('router', 'ratings', 'prepared_tables', 'liquidity_cache', 'mpc_checks', 'instruments',
+                                   'route_cache', 'feasibility'))
+    if 'ratings' in G.graph:
+        F.graph['ratings'] = G.graph['ratings'].copy()
+    elif ratings and not has_dicts and params is not None and params.rating_store != "dict":
+        F.graph['ratings'] = Rating_Store.RatingStore(G.number_of_nodes(), sparse=params.rating_store == "sparse")
+
+    F.graph['router'] = Router.get_router(G).fork(F)
+    return F
+
+
+# One sweep point, every strategy on a fork of the same network with the same payments.
+# Returns {strategy: success rate (%)}.
+def run_point(malicious_percentage, params=None, seed=None, strategies=PCN_Sim.STRATEGIES):
+    if params is None:
+        params = PCN_Sim.SimParams()
+    if seed is not None:
+        random.seed(seed)
+    base = PCN_Sim.create_pcn(params)
+    PCN_Sim.make_malicious(base, malicious_percentage)
+    workload = Workload.generate_workload(base.number_of_nodes(), params.transactions, params.max_send_amount)
+    run_seed = random.getrandbits(64)
+
+    success_rates = {}
+    for strategy in strategies:
+        G = fork(base, strategy in ("rating", "mpc_rating"), params)
+        random.seed(run_seed)
+        successful, failed = PCN_Sim.run_payments(G, strategy, params, PCN_Sim.workload_payments(workload))
+        success_rates[strategy] = round(successful / (successful + failed) * 100, 1)
+    return success_rates
+
+
+# The scripts' 13-point sweep with one network per point shared by all strategies
+def run_sweep(params=None, num_points=13, step=0.025, seed=None, strategies=PCN_Sim.STRATEGIES):
+    results = {strategy: [] for strategy in strategies}
+    malicious_percentage = 0
+    for point in range(num_points):
+        point_seed = None if seed is None else seed + point
+        for strategy, success_rate in run_point(malicious_percentage, params, point_seed, strategies).items():
+            results[strategy].append(success_rate)
+        malicious_percentage += step
+    return results
+
+
+# A fork behaves exactly like a fresh graph built the same way
+def check_fork_equivalent(strategy="mpc_rating", transactions=2000, seed=0):
+    params = PCN_Sim.SimParams(transactions=transactions)
+    workload = Workload.workload_for(params, seed)
+    results = []
+    for forked in (False, True):
+        random.seed(seed)
+        G = PCN_Sim.create_pcn(params, ratings=not forked and strategy in ("rating", "mpc_rating"))
+        PCN_Sim.make_malicious(G, 0.2)
+        if forked:
+            G = fork(G, strategy in ("rating", "mpc_rating"), params)
+        random.seed(seed + 1)
+        results.append(PCN_Sim.run_payments(G, strategy, params, PCN_Sim.workload_payments(workload)))
+    return results[0] == results[1]
+
+
+if __name__ == "__main__":
+    print(f"networkx {nx.__version__} internals as expected:", NETWORKX_INTERNALS_OK)
+    for strategy in PCN_Sim.STRATEGIES:
+        print(f"{strategy:>10}: fork identical to a fresh graph: {check_fork_equivalent(strategy)}")
+
+    for name, params in (("random 100 nodes", PCN_Sim.SimParams()),
+                         ("Nodes.csv", PCN_Sim.SimParams(topology="lightning", rating_store="sparse"))):
+        random.seed(0)
+        tracemalloc.start()
+        start = time.perf_counter()
+        graphs = []
+        for strategy in PCN_Sim.STRATEGIES:
+            G = PCN_Sim.create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+            PCN_Sim.make_malicious(G, 0.1)
+            Router.get_router(G)
+            graphs.append(G)
+        build_time = time.perf_counter() - start
+        build_memory = tracemalloc.get_traced_memory()[0] / len(graphs)
+        del graphs
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        base = PCN_Sim.create_pcn(params)
+        PCN_Sim.make_malicious(base, 0.1)
+        Router.get_router(base)
+        base_memory = tracemalloc.get_traced_memory()[0]
+        forks = [fork(base, strategy in ("rating", "mpc_rating"), params) for strategy in PCN_Sim.STRATEGIES]
+        fork_time = time.perf_counter() - start
+        fork_memory = (tracemalloc.get_traced_memory()[0] - base_memory) / len(forks)
+        # after 2000 payments on every fork
+        for strategy, G in zip(PCN_Sim.STRATEGIES, forks):
+            payments = Workload.generate_workload(G.number_of_nodes(), 2000, params.max_send_amount, seed=0)
+            PCN_Sim.run_payments(G, strategy, params, PCN_Sim.workload_payments(payments))
+        used_memory = (tracemalloc.get_traced_memory()[0] - base_memory) / len(forks)
+        tracemalloc.stop()
+        print(f"{name}: 4 builds {build_time:.2f} s, {build_memory / 1e6:.1f} MB each |"
+              f" 1 build + 4 forks {fork_time:.2f} s, {fork_memory / 1e6:.2f} MB per fork"
+              f" ({used_memory / 1e6:.1f} MB after 2000 payments)")
+
+    start = time.perf_counter()
+    print("Shared-network sweep (3 points):", run_sweep(PCN_Sim.SimParams(transactions=2000), num_points=3, seed=0),
+          f"{time.perf_counter() - start:.1f} s")
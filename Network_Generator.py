@@ -0,0 +1,180 @@
+import networkx as nx
+import numpy as np
+import random
+import time
+import Lightning_Topology
+import PCN_Graph
+
+# Bulk network generation with NumPy
+#
+# create_pcn draws one ordered pair at a time with random.sample, rejects it if the channel
+# already exists in either direction and adds both directions to networkx one by one, which
+# slows down with density and is too slow for 100k+ channels. Here all channels are drawn at
+# once as arrays (u, v, balance_uv, balance_vu), for one of the MODELS:
+#   erdos_renyi  num_channels distinct unordered pairs, uniform: the indices of the pairs in
+#                the n(n-1)/2 possible ones are drawn without replacement and decoded into
+#                (u, v); each pair gets a random direction and the pairs a random order, and both
+#                directional balances are uniform in [1, max_balance]. This is the distribution
+#                of create_pcn (see check_same_distribution).
+#   scale_free   expected degrees following a power law (Chung-Lu weights with exponent
+#                SCALE_FREE_EXPONENT), drawn like the Lightning topology: every node opens one
+#                channel, the rest have both endpoints proportional to the weights
+#   lightning    Lightning_Topology.generate_channels (degrees and capacities from Nodes.csv,
+#                num_channels is taken from the file)
+# The arrays go into networkx (to_networkx, same attributes and insertion order as create_pcn)
+# or straight into a PCN_Graph.CSRGraph (to_csr).
+
+MODELS = ("erdos_renyi", "scale_free", "lightning")
+MAX_CHANNEL_BALANCE = 1000
+SCALE_FREE_EXPONENT = 2.5
+
+
+# num_channels distinct unordered pairs of 0..num_nodes-1 as (u, v), uniform, in random order
+def draw_uniform_channels(num_nodes, num_channels, rng):
+    total = num_nodes * (num_nodes - 1) // 2
+    if num_channels > total:
+        raise ValueError(f"{num_channels} channels do not fit between {num_nodes} nodes")
+    keys = rng.choice(total, size=num_channels, replace=False)
+    # pair index k -> (i, j) with i < j and k = j(j-1)/2 + i; the float root is corrected by one
+    j = ((1 + np.sqrt(1 + 8 * keys.astype(np.float64))) // 2).astype(np.int64)
+    j -= j * (j - 1) // 2 > keys
+    j += (j + 1) * j // 2 <= keys
+    i = keys - j * (j - 1) // 2
+    return _orient(i, j, rng)
+
+
+# Random direction of every pair, like the ordered pair of random.sample
+def _orient(i, j, rng):
+    flip = rng.random(len(i)) < 0.5
+    return np.where(flip, j, i), np.where(flip, i, j)
+
+
+def scale_free_weights(num_nodes, rng, exponent=SCALE_FREE_EXPONENT):
+    weights = np.arange(1, num_nodes + 1, dtype=np.float64) ** (-1 / (exponent - 1))
+    return rng.permutation(weights)  # hubs at random node ids
+
+
+# Channels of a model as (num_nodes, u, v, balance_uv, balance_vu)
+def generate(model, num_nodes, num_channels, max_balance=MAX_CHANNEL_BALANCE, seed=None,
+             exponent=SCALE_FREE_EXPONENT):
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model!r}, expected one of {MODELS}")
+    if seed is None:
+        seed = random.getrandbits(32)  # follow the scripts' random state
+    if model == "lightning":
+        return Lightning_Topology.generate_channels(num_nodes, max_balance=max_balance, seed=seed)
+    rng = np.random.default_rng(seed)
+    if model == "erdos_renyi":
+        u, v = draw_uniform_channels(num_nodes, num_channels, rng)
+    else:
+        num_channels = min(num_channels, num_nodes * (num_nodes - 1) // 2)
+        u, v = Lightning_Topology.draw_channels(scale_free_weights(num_nodes, rng, exponent), num_channels, rng)
+        order = rng.permutation(len(u))
+        u, v = _orient(u[order], v[order], rng)
+    balance_uv = rng.integers(1, max_balance + 1, len(u))
+    balance_vu = rng.integers(1, max_balance + 1, len(u))
+    return num_nodes, u, v, balance_uv, balance_vu
+
+
+# Directed edges of the channels in create_pcn's insertion order: (u, v) then (v, u)
+def edge_arrays(channels):
+    n, u, v, balance_uv, balance_vu = channels
+    tails = np.column_stack([u, v]).ravel()
+    heads = np.column_stack([v, u]).ravel()
+    balances = np.column_stack([balance_uv, balance_vu]).ravel()
+    return tails, heads, balances
+
+
+def to_networkx(channels, ratings=False):
+    tails, heads, balances = edge_arrays(channels)
+    G = nx.DiGraph()
+    if ratings:
+        G.add_nodes_from((i, {'honest': True, 'rating': {}}) for i in range(channels[0]))
+    else:
+        G.add_nodes_from(range(channels[0]), honest=True)
+    G.add_edges_from(zip(tails.tolist(), heads.tolist(), ({'balance': b} for b in balances.tolist())))
+    return G
+
+
+def to_csr(channels):
+    return PCN_Graph.CSRGraph.from_arrays(channels[0], *edge_arrays(channels))
+
+
+# Compares create_pcn (the scripts' loop) with the erdos_renyi model over many small networks:
+# how often every unordered pair is a channel, the degree histogram and the balances, and
+# returns the p-values of the chi-square / Kolmogorov-Smirnov tests
+def check_same_distribution(networks=400, num_nodes=12, num_channels=30, max_balance=50, seed=0):
+    import scipy.stats
+    import PCN_Sim
+    params = PCN_Sim.SimParams(num_nodes=num_nodes, num_channels=num_channels, max_channel_balance=max_balance)
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    total = num_nodes * (num_nodes - 1) // 2
+    samples = []
+    for bulk in (False, True):
+        pairs = np.zeros(total, dtype=np.int64)
+        degrees = np.zeros(num_nodes, dtype=np.int64)
+        balances = []
+        for _ in range(networks):
+            if bulk:
+                G = to_networkx(generate("erdos_renyi", num_nodes, num_channels, max_balance, seed=rng.integers(2 ** 32)))
+            else:
+                G = PCN_Sim.create_pcn(params)
+            for u, v in G.edges():
+                if u < v:
+                    pairs[v * (v - 1) // 2 + u] += 1
+            degrees += np.bincount([d for _, d in G.out_degree()], minlength=num_nodes)[:num_nodes]
+            balances.extend(b for _, _, b in G.edges(data='balance'))
+        samples.append((pairs, degrees, balances))
+    (loop_pairs, loop_degrees, loop_balances), (bulk_pairs, bulk_degrees, bulk_balances) = samples
+    degrees = (loop_degrees + bulk_degrees) > 0
+    return {
+        "pairs": scipy.stats.chi2_contingency([loop_pairs, bulk_pairs]).pvalue,
+        "degrees": scipy.stats.chi2_contingency([loop_degrees[degrees], bulk_degrees[degrees]]).pvalue,
+        "balances": scipy.stats.ks_2samp(loop_balances, bulk_balances).pvalue,
+    }
+
+
+# CSRGraph.from_arrays builds the same arrays as the CSRGraph constructor
+def check_from_arrays(num_nodes=500, num_channels=2000, seed=0):
+    channels = generate("erdos_renyi", num_nodes, num_channels, seed=seed)
+    tails, heads, balances = edge_arrays(channels)
+    fast = to_csr(channels)
+    slow = PCN_Graph.CSRGraph(num_nodes, list(zip(tails.tolist(), heads.tolist())), balances.tolist())
+    same = all(np.array_equal(getattr(fast, name), getattr(slow, name))
+               for name in ("indptr", "indices", "rev", "balance", "in_indptr", "in_sources", "in_edges", "honest"))
+    return same and fast.edge_ids == slow.edge_ids
+
+
+if __name__ == "__main__":
+    import PCN_Sim
+
+    print("CSRGraph.from_arrays identical to the constructor:", check_from_arrays())
+    print("create_pcn vs erdos_renyi, p-values:",
+          {name: round(p, 3) for name, p in check_same_distribution().items()})
+
+    for num_nodes, num_channels in ((100, 400), (10000, 40000), (100000, 400000), (1000000, 4000000)):
+        params = PCN_Sim.SimParams(num_nodes=num_nodes, num_channels=num_channels)
+        row = f"{num_nodes:>8} nodes {num_channels:>8} channels |"
+        if num_channels <= 400000:
+            random.seed(0)
+            start = time.perf_counter()
+            PCN_Sim.create_pcn(params)
+            row += f" create_pcn loop {time.perf_counter() - start:7.3f} s |"
+        start = time.perf_counter()
+        channels = generate("erdos_renyi", num_nodes, num_channels, seed=0)
+        row += f" arrays {time.perf_counter() - start:6.3f} s |"
+        start = time.perf_counter()
+        to_csr(channels)
+        row += f" + CSR {time.perf_counter() - start:6.3f} s |"
+        if num_channels <= 400000:
+            start = time.perf_counter()
+            to_networkx(channels)
+            row += f" + networkx {time.perf_counter() - start:6.3f} s"
+        print(row)
+
+    for model in MODELS:
+        g = to_csr(generate(model, 10000 if model != "lightning" else None, 40000, seed=0))
+        degrees = np.diff(g.indptr)
+        print(f"{model:>12}: {g.num_nodes} nodes, {g.num_edges // 2} channels, degree median {int(np.median(degrees))}"
+              f" max {int(degrees.max())}, isolated {int((degrees == 0).sum())}")
@@ -0,0 +1,427 @@
+import networkx as nx
+import numpy as np
+import random
+import time
+import PCN_Sim
+import Yao_MPC
+
+# Array-backed (CSR) Payment Channel Network
+#
+# The topology never changes after create_pcn, only balances do, so the graph is stored as
+#   indptr  (int32, n+1)  out-edges of u are edge ids indptr[u] .. indptr[u+1]-1
+#   indices (int32, m)    head node of every edge id
+#   rev     (int32, m)    edge id of the opposite direction (v, u) of every edge id
+#   balance (int64, m)    balance of every directed edge
+#   honest  (bool,  n)    honest flag of every node
+# plus an in-edge CSR (in_indptr/in_sources/in_edges) for backward searches.
+# Neighbors keep the networkx insertion order, so traversals see them in the same order.
+#
+# This is a standalone engine for benchmarks and large generated topologies (Lightning_Topology,
+# Network_Generator, Snapshot): PCN_Sim.run_payments and the scripts keep running on networkx.
+# The functions below mirror the baseline and MPC routing and the HTLC outcome of PCN_Sim, with
+# limits (max_attempts, max_channel_balance, max_send_amount, mpc_engine) from a PCN_Sim.SimParams.
+
+
+class CSRGraph:
+    def __init__(self, num_nodes, edges, balances, honest=None, in_order=None):
+        # edges: list of (u, v) in insertion order, balances: matching list of balances.
+        # in_order optionally gives the order of the in-edges when it differs from the
+        # insertion order (e.g. the pred order of an existing networkx graph).
+        self.num_nodes = num_nodes
+        self.num_edges = len(edges)
+
+        out_lists = [[] for _ in range(num_nodes)]
+        in_lists = [[] for _ in range(num_nodes)]
+        for k, (u, v) in enumerate(edges):
+            out_lists[u].append(k)
+        if in_order is None:
+            for k, (u, v) in enumerate(edges):
+                in_lists[v].append(k)
+        else:
+            position = {edge: k for k, edge in enumerate(edges)}
+            for u, v in in_order:
+                in_lists[v].append(position[(u, v)])
+
+        order = [k for out in out_lists for k in out]  # edge ids grouped by tail node
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        self.indptr[1:] = np.cumsum([len(out) for out in out_lists])
+        self.indices = np.array([edges[k][1] for k in order], dtype=np.int32)
+        self.balance = np.array([balances[k] for k in order], dtype=np.int64)
+
+        self.edge_ids = {edges[k]: eid for eid, k in enumerate(order)}
+        self.rev = np.array([self.edge_ids.get((v, u), -1) for u, v in (edges[k] for k in order)], dtype=np.int32)
+
+        self.in_indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        self.in_indptr[1:] = np.cumsum([len(inc) for inc in in_lists])
+        self.in_sources = np.array([edges[k][0] for inc in in_lists for k in inc], dtype=np.int32)
+        self.in_edges = np.array([self.edge_ids[edges[k]] for inc in in_lists for k in inc], dtype=np.int32)
+
+        if honest is None:
+            self.honest = np.ones(num_nodes, dtype=bool)
+        else:
+            self.honest = np.array(honest, dtype=bool)
+        self._cache_lists()
+
+    # Same graph as CSRGraph(num_nodes, list(zip(tails, heads)), balances) for edges given as
+    # arrays in insertion order, built with array operations instead of per-edge lists
+    @classmethod
+    def from_arrays(cls, num_nodes, tails, heads, balances, honest=None):
+        g = cls.__new__(cls)
+        tails = np.asarray(tails, dtype=np.int64)
+        heads = np.asarray(heads, dtype=np.int64)
+        g.num_nodes = num_nodes
+        g.num_edges = len(tails)
+
+        order = np.argsort(tails, kind="stable")  # edge ids grouped by tail node
+        edge_id = np.empty(len(order), dtype=np.int64)
+        edge_id[order] = np.arange(len(order))
+        g.indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        g.indptr[1:] = np.cumsum(np.bincount(tails, minlength=num_nodes))
+        g.indices = heads[order].astype(np.int32)
+        g.balance = np.asarray(balances, dtype=np.int64)[order]
+
+        sorted_tails = tails[order]
+        g.edge_ids = dict(zip(zip(sorted_tails.tolist(), g.indices.tolist()), range(g.num_edges)))
+        # rev: look up the key of every reversed edge among the sorted edge keys (queries sorted too)
+        keys = sorted_tails * num_nodes + g.indices
+        by_key = np.argsort(keys)
+        sorted_keys = keys[by_key]
+        reverse_keys = g.indices.astype(np.int64) * num_nodes + sorted_tails
+        by_reverse = np.argsort(reverse_keys)
+        queries = reverse_keys[by_reverse]
+        position = np.minimum(np.searchsorted(sorted_keys, queries), max(g.num_edges - 1, 0))
+        g.rev = np.full(g.num_edges, -1, dtype=np.int32)
+        if g.num_edges:
+            found = sorted_keys[position] == queries
+            g.rev[by_reverse[found]] = by_key[position[found]]
+
+        in_order = np.argsort(heads, kind="stable")  # in-edges of a node in insertion order
+        g.in_indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+        g.in_indptr[1:] = np.cumsum(np.bincount(heads, minlength=num_nodes))
+        g.in_sources = tails[in_order].astype(np.int32)
+        g.in_edges = edge_id[in_order].astype(np.int32)
+
+        g.honest = np.ones(num_nodes, dtype=bool) if honest is None else np.array(honest, dtype=bool)
+        g._cache_lists()
+        return g
+
+    # Plain-list copies of the static topology for the Python-level traversals
+    def _cache_lists(self):
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._in_indptr = self.in_indptr.tolist()
+        self._in_sources = self.in_sources.tolist()
+        self._in_edges = self.in_edges.tolist()
+
+    def edge_id(self, u, v):
+        return self.edge_ids.get((u, v), -1)
+
+    def has_edge(self, u, v):
+        return (u, v) in self.edge_ids
+
+    def neighbors(self, u):
+        return self._indices[self._indptr[u]:self._indptr[u + 1]]
+
+    def predecessors(self, v):
+        return self._in_sources[self._in_indptr[v]:self._in_indptr[v + 1]]
+
+    def get_channel_balance(self, u, v):
+        eid = self.edge_id(u, v)
+        return int(self.balance[eid]) if eid >= 0 else 0
+
+    def path_edge_ids(self, path):
+        edge_ids = self.edge_ids
+        return [edge_ids[(u, v)] for u, v in zip(path, path[1:])]
+
+    def edges(self):
+        for u in range(self.num_nodes):
+            for eid in range(self._indptr[u], self._indptr[u + 1]):
+                yield u, self._indices[eid], eid
+
+    # Edge ids in an order that reproduces both the out-edge and the in-edge order when
+    # the edges are added one by one (topological order of the two neighbor chains)
+    def insertion_order(self):
+        tails = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr)).tolist()
+        next_in = [-1] * self.num_edges
+        waiting = [0] * self.num_edges
+        for v in range(self.num_nodes):
+            chain = self._in_edges[self._in_indptr[v]:self._in_indptr[v + 1]]
+            for a, b in zip(chain, chain[1:]):
+                next_in[a] = b
+                waiting[b] += 1
+        for eid in range(self.num_edges):
+            if eid > self._indptr[tails[eid]]:
+                waiting[eid] += 1
+        ready = [eid for eid in range(self.num_edges) if waiting[eid] == 0]
+        order = []
+        while ready:
+            eid = ready.pop()
+            order.append(eid)
+            followers = [next_in[eid]]
+            if eid + 1 < self._indptr[tails[eid] + 1]:
+                followers.append(eid + 1)
+            for nxt in followers:
+                if nxt >= 0:
+                    waiting[nxt] -= 1
+                    if waiting[nxt] == 0:
+                        ready.append(nxt)
+        return order
+
+
+# Converters to and from the networkx graphs used by the scripts (nodes must be 0..n-1)
+def from_networkx(G):
+    edges = list(G.edges())
+    balances = [G[u][v]['balance'] for u, v in edges]
+    honest = [G.nodes[n].get('honest', True) for n in range(G.number_of_nodes())]
+    in_order = [(u, v) for v in G for u in G.pred[v]]
+    return CSRGraph(G.number_of_nodes(), edges, balances, honest, in_order)
+
+
+def to_networkx(g):
+    G = nx.DiGraph()
+    for n in range(g.num_nodes):
+        G.add_node(n, honest=bool(g.honest[n]))
+    tails = np.repeat(np.arange(g.num_nodes), np.diff(g.indptr))
+    for eid in g.insertion_order():
+        G.add_edge(int(tails[eid]), g._indices[eid], balance=int(g.balance[eid]))
+    return G
+
+
+# Same sampling as PCN_Sim.create_pcn (random topology): for the same random state it draws
+# the same channels and balances, only the storage is different
+def create_pcn(params=None):
+    if params is None:
+        params = PCN_Sim.SimParams()
+    num_nodes = params.num_nodes
+    edges = []
+    balances = []
+    seen = set()
+    while len(seen) < params.num_channels:
+        u, v = random.sample(range(num_nodes), 2)
+        if u != v and (u, v) not in seen and (v, u) not in seen:
+            # Each direction has its own balance
+            edges.append((u, v))
+            balances.append(random.randint(1, params.max_channel_balance))
+            edges.append((v, u))
+            balances.append(random.randint(1, params.max_channel_balance))
+            seen.add((u, v))
+    return CSRGraph(num_nodes, edges, balances)
+
+
+# Mark some nodes as malicious
+def make_malicious(g, percent):
+    malicious_nodes = random.sample(range(g.num_nodes), int(g.num_nodes * percent))
+    g.honest[malicious_nodes] = False
+
+
+# Shortest path by bidirectional BFS, exclude_edges is a set of edge ids.
+# Same search order as nx.shortest_path (nx.bidirectional_shortest_path), so it returns
+# the same path as find_path_bfs in the scripts on the same graph.
+def find_path_bfs(g, sender, receiver, exclude_edges=None):
+    if not (0 <= sender < g.num_nodes and 0 <= receiver < g.num_nodes):
+        return None
+    if sender == receiver:
+        return [sender]
+    if exclude_edges is None:
+        exclude_edges = ()
+    indptr, indices = g._indptr, g._indices
+    in_indptr, in_sources, in_edges = g._in_indptr, g._in_sources, g._in_edges
+
+    pred = {sender: None}
+    succ = {receiver: None}
+    forward_fringe = [sender]
+    reverse_fringe = [receiver]
+    meet = None
+    while forward_fringe and reverse_fringe and meet is None:
+        if len(forward_fringe) <= len(reverse_fringe):
+            this_level = forward_fringe
+            forward_fringe = []
+            for v in this_level:
+                for eid in range(indptr[v], indptr[v + 1]):
+                    if eid in exclude_edges:
+                        continue
+                    w = indices[eid]
+                    if w not in pred:
+                        forward_fringe.append(w)
+                        pred[w] = v
+                    if w in succ:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+        else:
+            this_level = reverse_fringe
+            reverse_fringe = []
+            for v in this_level:
+                for k in range(in_indptr[v], in_indptr[v + 1]):
+                    if in_edges[k] in exclude_edges:
+                        continue
+                    w = in_sources[k]
+                    if w not in succ:
+                        succ[w] = v
+                        reverse_fringe.append(w)
+                    if w in pred:
+                        meet = w
+                        break
+                if meet is not None:
+                    break
+    if meet is None:
+        return None
+
+    path = []
+    w = meet
+    while w is not None:
+        path.append(w)
+        w = pred[w]
+    path.reverse()
+    w = succ[path[-1]]
+    while w is not None:
+        path.append(w)
+        w = succ[w]
+    return path
+
+
+# Baseline routing (PCN.py): exclude the first edge with insufficient balance and retry
+def find_valid_path_HTLC_Helper(g, sender, receiver, send_amount, params):
+    visited_edges = set()
+    local_failures = 0
+    balance = g.balance
+    for _ in range(params.max_attempts):
+        path = find_path_bfs(g, sender, receiver, visited_edges)
+        if path is None:
+            return None, local_failures
+        path_is_valid = True
+        for eid in g.path_edge_ids(path):
+            if balance[eid] < send_amount:
+                visited_edges.add(eid)
+                local_failures += 1
+                path_is_valid = False
+                break
+        if path_is_valid:
+            return path, local_failures
+    return None, local_failures
+
+
+# MPC routing (PNC_MPC.py): private liquidity check for every hop towards an honest node
+def find_valid_path_with_mpc(g, sender, receiver, send_amount, params):
+    mpc = Yao_MPC.get_engine(params.mpc_engine)
+    visited_edges = set()
+    balance = g.balance
+    honest = g.honest
+    for _ in range(params.max_attempts):
+        path = find_path_bfs(g, sender, receiver, visited_edges)
+        if path is None:
+            return None
+        path_is_valid = True
+        for v, eid in zip(path[1:], g.path_edge_ids(path)):
+            if honest[v]:
+                bal = int(balance[eid])
+                # the third parameter in Yao_Millionaires_Protocol should be set to a value greater than the balance
+                if not mpc(send_amount, bal, params.max_channel_balance + bal, 40):
+                    visited_edges.add(eid)
+                    path_is_valid = False
+                    break
+        if path_is_valid:
+            return path
+    return None
+
+
+# HTLC payment with the same outcome and balances as simulate_htlc_payment in PCN.py.
+# There, a malicious node anywhere after the sender makes every lock and reverse credit
+# get refunded, so the net effect is either nothing (failure) or forward -amount and
+# reverse +amount on every hop (success).
+def simulate_htlc_payment(g, path, amount):
+    if not g.honest[path[1:]].all():
+        return False
+    forward = g.path_edge_ids(path)
+    g.balance[forward] -= amount
+    g.balance[g.rev[forward]] += amount
+    return True
+
+
+# Payments/sec of the baseline routing + HTLC loop on networkx and on CSR
+def _run_networkx(G, workload, params):
+    successful = 0
+    for sender, receiver, amount in workload:
+        visited_edges = set()
+        path = None
+        for _ in range(params.max_attempts):
+            view = nx.subgraph_view(G, filter_edge=lambda u, v: (u, v) not in visited_edges)
+            try:
+                candidate = nx.shortest_path(view, sender, receiver)
+            except (nx.NetworkXNoPath, nx.NodeNotFound):
+                break
+            blocked = next(((u, v) for u, v in zip(candidate, candidate[1:]) if G[u][v]['balance'] < amount), None)
+            if blocked is None:
+                path = candidate
+                break
+            visited_edges.add(blocked)
+        if path is None:
+            continue
+        if all(G.nodes[n]['honest'] for n in path[1:]):
+            for u, v in zip(path, path[1:]):
+                G[u][v]['balance'] -= amount
+                G[v][u]['balance'] += amount
+            successful += 1
+    return successful
+
+
+def _run_csr(g, workload, params):
+    successful = 0
+    for sender, receiver, amount in workload:
+        path, _ = find_valid_path_HTLC_Helper(g, sender, receiver, amount, params)
+        if path is not None and simulate_htlc_payment(g, path, amount):
+            successful += 1
+    return successful
+
+
+def benchmark(sizes=(100, 1000, 10000), payments=2000, channels_per_node=4, malicious=0.1, seed=0):
+    results = []
+    for num_nodes in sizes:
+        params = PCN_Sim.SimParams(num_nodes=num_nodes, num_channels=channels_per_node * num_nodes)
+        random.seed(seed)
+        g = create_pcn(params)
+        make_malicious(g, malicious)
+        G = to_networkx(g)
+        workload = []
+        for _ in range(payments):
+            sender, receiver = random.sample(range(num_nodes), 2)
+            workload.append((sender, receiver, random.randint(1, params.max_send_amount)))
+
+        start = time.perf_counter()
+        nx_successful = _run_networkx(G, workload, params)
+        nx_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        csr_successful = _run_csr(g, workload, params)
+        csr_time = time.perf_counter() - start
+
+        results.append({
+            "nodes": num_nodes,
+            "channels": channels_per_node * num_nodes,
+            "payments": payments,
+            "networkx_payments_per_sec": payments / nx_time,
+            "csr_payments_per_sec": payments / csr_time,
+            "networkx_successful": nx_successful,
+            "csr_successful": csr_successful,
+            # same paths and same final balances on both representations
+            "identical": nx_successful == csr_successful and np.array_equal(from_networkx(G).balance, g.balance),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # Round trip check: networkx -> CSR -> networkx keeps nodes, edges, balances and honest flags
+    random.seed(1)
+    g = create_pcn()
+    make_malicious(g, 0.2)
+    G = to_networkx(g)
+    back = to_networkx(from_networkx(G))
+    same_order = all(list(G.succ[n]) == list(back.succ[n]) and list(G.pred[n]) == list(back.pred[n]) for n in G)
+    print("Round trip identical:", nx.utils.graphs_equal(G, back) and same_order)
+
+    for row in benchmark():
+        print(f"{row['nodes']:>6} nodes | networkx {row['networkx_payments_per_sec']:9.1f} payments/s"
+              f" | CSR {row['csr_payments_per_sec']:9.1f} payments/s"
+              f" | successful {row['networkx_successful']} / {row['csr_successful']}"
+              f" | identical {row['identical']}")
@@ -0,0 +1,640 @@
+import networkx as nx
+import random
+import hashlib
+import time
+import dataclasses
+from dataclasses import dataclass
+import Router
+import Lightning_Topology
+import Feasibility_Index
+import Liquidity_Cache
+import Network_Generator
+import Rating_Store
+import Route_Cache
+import Yao_MPC
+
+# Payment Channel Network (PCN) simulation library
+#
+# The pieces shared by PCN.py (baseline), PNC_MPC.py (MPC), PCN_RATING.py (rating) and
+# PCN_MPC_RATING.py (MPC + rating). Importing this module does no simulation work; the
+# scripts only pick a strategy and their parameters and call run_simulation.
+# Per-graph state (router, MPC caches, rating store) lives in G.graph, so nothing here is a module global.
+
+STRATEGIES = ("baseline", "mpc", "rating", "mpc_rating")
+ROUTING_MODES = ("bfs", "capacity", "widest")
+WORKLOAD_CHUNK = 65536 # rows of a pre-drawn workload converted to Python ints at a time
+
+
+@dataclass
+class SimParams:
+    num_nodes: int = 100
+    num_channels: int = 400
+    max_channel_balance: int = 1000
+    max_send_amount: int = 100
+    max_attempts: int = 10 # Max attempts to find a valid path
+    transactions: int = 10000 # payments per sweep point
+    topology: str = "random" # "random": create_pcn with num_nodes/num_channels, "lightning": generated from Nodes.csv, "scale_free": power-law degrees (Network_Generator)
+    lean_settlement: bool = True # True: settle_htlc_payment (one pass, same outcome and balances), False: the scripts' simulate_htlc_payment
+    realistic_crypto: bool = False # True: hash the preimage and verify it at every hop when settling (lean_settlement only; the scripts hash it once and never use it)
+    bulk_generation: bool = False # True: draw the "random" topology with NumPy (Network_Generator, same distribution, different random stream)
+    lightning_nodes: int = None # number of Nodes.csv nodes to sample for the "lightning" topology, None for all
+    incremental_repair: bool = False # True: repair the sender's BFS layering after a failed hop instead of searching again from scratch
+    feasibility_prefilter: str = None # None: search every payment, "degree": reject a payment right away if the sender's largest outbound or the receiver's largest inbound balance is below the amount, "local": also a two-hop bound (see Feasibility_Index); a rejected payment is handled like one without a path (one local failure in find_valid_path_HTLC_Helper)
+    route_cache: str = None # None: search every first candidate, "pairs": cache the first path of every (sender, receiver) (same results), "trees": one BFS tree per sender (see Route_Cache)
+    route_cache_bytes: int = 16 * 2 ** 20 # memory budget of the route cache
+    routing: str = "bfs" # "bfs": shortest path, retried per discovered bottleneck; oracles that read every balance: "capacity": shortest path over edges with balance >= amount, "widest": max-bottleneck path
+    # MPC
+    mpc_engine: str = "numpy" # "python" or "numpy", both return identical results (see Yao_MPC.check_engines_equivalent)
+    use_prepared_mpc: bool = True # reuse one prepared Yao table per channel balance instead of rebuilding it for every amount
+    use_liquidity_cache: bool = True # skip the MPC when an earlier check on the same balance already decides the answer
+    liquidity_cache_size: int = 4096 # max number of edges kept in the liquidity cache
+    # Ratings
+    min_rating_threshold: int = 0 # MIN_RATING_THRESHOLD and MAX_RATING_THRESHOLD are neighborhood rating range the node is comfortable sharing/updating ratings with
+    max_rating_threshold: int = 1
+    node_rating_update_percentage: float = 0.9 # goes from 0-1 # 0.9 means 90% of the time the node will update its ratings
+    rating_store: str = "dense" # "dict": rating dict per node, "dense": int32 N×N array, "sparse": scipy.sparse rows (large N)
+    rating_gossip: bool = False # True: update_ratings before a payment with probability node_rating_update_percentage
+    incremental_rating_updates: bool = True # only re-propagate ratings into nodes whose own or neighbors' ratings changed (rating store only)
+    rating_pruned_search: bool = False # True: the route search skips nodes the sender rates <= min_rating_threshold (fewer searches, different paths), False: reject a path through them after finding it, as the scripts always did
+
+
+# Initialize the graph
+def create_pcn(params, ratings=False):
+    rating_dicts = ratings and params.rating_store == "dict"
+    if params.topology == "lightning":
+        G = Lightning_Topology.create_lightning_pcn(params.lightning_nodes, ratings=rating_dicts,
+                                                    max_balance=params.max_channel_balance)
+    elif params.topology == "scale_free" or params.bulk_generation:
+        model = "scale_free" if params.topology == "scale_free" else "erdos_renyi"
+        channels = Network_Generator.generate(model, params.num_nodes, params.num_channels, params.max_channel_balance)
+        G = Network_Generator.to_networkx(channels, ratings=rating_dicts)
+    else:
+        G = nx.DiGraph()
+        for i in range(params.num_nodes):
+            if rating_dicts:
+                G.add_node(i, honest=True, rating={})
+            else:
+                G.add_node(i, honest=True)
+
+        edges = set()
+        while len(edges) < params.num_channels:
+            u, v = random.sample(range(params.num_nodes), 2)
+            if u != v and (u, v) not in edges and (v, u) not in edges:
+                # Each direction has its own balance
+                balance_uv = random.randint(1, params.max_channel_balance)
+                balance_vu = random.randint(1, params.max_channel_balance)
+                G.add_edge(u, v, balance=balance_uv)
+                G.add_edge(v, u, balance=balance_vu)
+                edges.add((u, v))
+    if ratings and not rating_dicts:
+        G.graph['ratings'] = Rating_Store.RatingStore(G.number_of_nodes(), sparse=params.rating_store == "sparse")
+    return G
+
+
+# Mark some nodes as malicious
+def make_malicious(G, percent):
+    malicious_nodes = random.sample(list(G.nodes()), int(G.number_of_nodes() * percent))
+    for node in malicious_nodes:
+        G.nodes[node]["honest"] = False
+
+
+def get_channel_balance(G, u, v):
+    return G[u][v]['balance'] if G.has_edge(u, v) else 0
+
+
+def find_path_bfs(G, sender, receiver, exclude_edges=None, exclude_nodes=None):
+    # Bidirectional BFS on the graph's router: same path as nx.shortest_path on a
+    # subgraph_view without exclude_edges/exclude_nodes, without building the view on every retry
+    return Router.get_router(G).shortest_path(sender, receiver, exclude_edges, exclude_nodes)
+
+
+# All ratings of rater as a {node: score} dict, whatever the rating store
+def ratings_of(G, rater):
+    store = G.graph.get('ratings')
+    if store is not None:
+        return store.ratings_of(rater)
+    return dict(G.nodes[rater]['rating'])
+
+
+# Rating the sender has given to node, None if it has not rated it yet
+def sender_rating(G, sender, node):
+    store = G.graph.get('ratings')
+    if store is not None:
+        return store.get(sender, node)
+    return G.nodes[sender]["rating"].get(node)
+
+
+# Nodes the sender rates <= threshold: the nodes a rating-aware payment must not go through
+def low_rated_nodes(G, sender, threshold):
+    store = G.graph.get('ratings')
+    if store is not None:
+        return store.nodes_rated_at_most(sender, threshold)
+    return {node for node, score in G.nodes[sender]['rating'].items() if score <= threshold}
+
+
+# Feasibility index of a graph (params.feasibility_prefilter), built on first use and kept in G.graph
+def get_feasibility_index(G, params):
+    if 'feasibility' not in G.graph:
+        G.graph['feasibility'] = Feasibility_Index.FeasibilityIndex(G, params.feasibility_prefilter)
+    return G.graph['feasibility']
+
+
+# Route cache of a graph (params.route_cache), built on first use and kept in G.graph
+def get_route_cache(G, params):
+    if params.route_cache is None:
+        return None
+    if 'route_cache' not in G.graph:
+        G.graph['route_cache'] = Route_Cache.RouteCache(Router.get_router(G), params.route_cache, params.route_cache_bytes)
+    return G.graph['route_cache']
+
+
+# Route candidates of one payment: the sender's incremental search (incremental_repair) or
+# None for a fresh search per attempt, and the nodes to skip (rating_pruned_search)
+def start_route_search(G, sender, params, use_ratings):
+    low_rated = None
+    if use_ratings and params.rating_pruned_search:
+        low_rated = low_rated_nodes(G, sender, params.min_rating_threshold)
+    search = Router.get_router(G).incremental(sender, low_rated) if params.incremental_repair else None
+    return search, low_rated
+
+
+# Oracle routing (routing "capacity" or "widest"): one search that reads every balance, so
+# no bottleneck is discovered hop by hop and no MPC check is needed. Gives upper bounds for
+# what an informed router could reach; low-rated nodes are always skipped with use_ratings.
+def find_oracle_path(G, sender, receiver, send_amount, params, use_ratings=False):
+    router = Router.get_router(G)
+    low_rated = low_rated_nodes(G, sender, params.min_rating_threshold) if use_ratings else None
+    if params.routing == "capacity":
+        return router.shortest_path(sender, receiver, None, low_rated, min_balance=send_amount)
+    path, width = router.widest_path(sender, receiver, low_rated)
+    return path if width >= send_amount else None
+
+
+# Rejecting a path for a low rating without excluding anything means every further attempt
+# finds the same path again, so the payment fails right away; the skipped searches are counted
+def reject_low_rated(G, params, attempts):
+    Router.get_router(G).rating_searches_saved += params.max_attempts - attempts - 1
+
+
+# Adds delta to the rating rater gives every node in nodes (first rating is delta itself)
+def rate_nodes(G, rater, nodes, delta):
+    store = G.graph.get('ratings')
+    if store is not None:
+        store.add_many(rater, nodes, delta)
+        return
+    ratings = G.nodes[rater]['rating']
+    for node in nodes:
+        if node not in ratings:
+            ratings[node] = delta  # First success/failure
+        else:
+            ratings[node] += delta
+
+
+# Path without MPC: hops are checked against the real balance, the first hop without enough
+# balance is excluded and counted as a failure (local_failures) before searching again.
+# With use_ratings, nodes the sender rated <= min_rating_threshold are skipped by the search
+# (rating_pruned_search) or a path through them is rejected.
+def find_valid_path_HTLC_Helper(G, sender, receiver, send_amount, params, use_ratings=False):
+    if params.feasibility_prefilter and not get_feasibility_index(G, params).feasible(sender, receiver, send_amount):
+        return None, 1
+    if params.routing != "bfs":
+        return find_oracle_path(G, sender, receiver, send_amount, params, use_ratings), 0
+    visited_edges = set()
+    router = Router.get_router(G)
+    search, low_rated = start_route_search(G, sender, params, use_ratings)
+    route_cache = get_route_cache(G, params)
+    check_ratings = use_ratings and low_rated is None
+    attempts = 0
+    local_failures = 0
+    while attempts < params.max_attempts:
+        if search:
+            path = search.path_to(receiver)
+        elif route_cache is not None and not visited_edges:
+            path = route_cache.path(sender, receiver, low_rated)  # nothing excluded yet: first candidate
+        else:
+            path = find_path_bfs(G, sender, receiver, visited_edges, low_rated)
+        if path is None:
+            return None, local_failures  # no path left
+        path_is_valid = True
+        for u, v in zip(path, path[1:]):
+            router.hops_checked += 1
+            if check_ratings:
+                rating = sender_rating(G, sender, v)
+                if rating is not None and rating <= params.min_rating_threshold:
+                    reject_low_rated(G, params, attempts)
+                    return None, local_failures
+            if G[u][v]['balance'] < send_amount:
+                visited_edges.add((u, v))
+                if search:
+                    search.exclude(u, v)
+                # preserve your per-edge failure accounting
+                local_failures += 1
+                path_is_valid = False
+                break
+
+        if path_is_valid:
+            return path, local_failures
+        attempts += 1
+    return None, local_failures
+
+
+# MPC caches of a graph, built on first use and kept in G.graph
+def get_mpc_caches(G, params):
+    if 'prepared_tables' not in G.graph:
+        G.graph['prepared_tables'] = Yao_MPC.PreparedComparisonStore(params.max_channel_balance)
+        G.graph['liquidity_cache'] = Liquidity_Cache.LiquidityCache(params.liquidity_cache_size)
+    return G.graph['prepared_tables'], G.graph['liquidity_cache']
+
+
+# Private liquidity check of edge (u, v), going through the liquidity cache and prepared tables
+def check_liquidity_mpc(G, u, v, bal, send_amount, params):
+    prepared_tables, liquidity_cache = get_mpc_caches(G, params)
+    G.graph['mpc_checks'] = G.graph.get('mpc_checks', 0) + 1
+    if params.use_liquidity_cache:
+        cached = liquidity_cache.lookup(u, v, send_amount)
+        if cached is not None:
+            return cached
+    if params.use_prepared_mpc:
+        has_liquidity = prepared_tables.get((u, v), bal).compare(send_amount)
+    else:
+        # the third parameter in Yao_Millionaires_Protocol should be set to a value greater than the balance
+        has_liquidity = Yao_MPC.get_engine(params.mpc_engine)(send_amount, bal, params.max_channel_balance + bal, 40)
+    if params.use_liquidity_cache:
+        liquidity_cache.record(u, v, send_amount, has_liquidity)
+    return has_liquidity
+
+
+# Path with MPC: every hop towards an honest node is checked with Yao's protocol instead of
+# reading the balance. With use_ratings, low-rated nodes are handled as in the helper above.
+def find_valid_path_with_mpc(G, sender, receiver, send_amount, params, use_ratings=False):
+    if params.feasibility_prefilter and not get_feasibility_index(G, params).feasible(sender, receiver, send_amount):
+        return None
+    if params.routing != "bfs":
+        return find_oracle_path(G, sender, receiver, send_amount, params, use_ratings)
+    visited_edges = set()
+    router = Router.get_router(G)
+    search, low_rated = start_route_search(G, sender, params, use_ratings)
+    route_cache = get_route_cache(G, params)
+    check_ratings = use_ratings and low_rated is None
+    attempts = 0
+
+    while attempts < params.max_attempts:
+        if search:
+            path = search.path_to(receiver)
+        elif route_cache is not None and not visited_edges:
+            path = route_cache.path(sender, receiver, low_rated)  # nothing excluded yet: first candidate
+        else:
+            path = find_path_bfs(G, sender, receiver, visited_edges, low_rated)
+        if path is None:
+            return None  # no path left
+        path_is_valid = True
+        # IMPORTANT: don't skip the first edge; use zip
+        for u, v in zip(path, path[1:]):
+            router.hops_checked += 1
+            if check_ratings:
+                rating = sender_rating(G, sender, v)
+                if rating is not None and rating <= params.min_rating_threshold:
+                    reject_low_rated(G, params, attempts)
+                    return None
+
+            bal = G[u][v]['balance']
+            if G.nodes[v]['honest']:
+                if not check_liquidity_mpc(G, u, v, bal, send_amount, params):
+                    visited_edges.add((u, v))
+                    if search:
+                        search.exclude(u, v)
+                    # If your channels are effectively bidirectional, you may also:
+                    # visited_edges.add((v, u))
+                    path_is_valid = False
+                    break
+
+        if path_is_valid:
+            return path
+
+        attempts += 1
+
+    return None
+
+
+# One round of rating gossip. The dict version always runs a full round over every node.
+def update_ratings(G, params):
+    store = G.graph.get('ratings')
+    if store is not None:
+        router = Router.get_router(G)
+        if params.incremental_rating_updates:
+            store.update_ratings_incremental(router.succ, router.pred, params.min_rating_threshold, params.max_rating_threshold)
+        else:
+            store.update_ratings(router.succ, params.min_rating_threshold, params.max_rating_threshold)
+        return
+    for node in G.nodes():
+        rating_threshold = random.randint(params.min_rating_threshold, params.max_rating_threshold)
+        neighbors = list(G.neighbors(node))
+        node_rating = G.nodes[node]['rating']
+        if not node_rating:
+            continue  # no trust yet, skip
+
+        for neighbor in neighbors:
+            # Only trust ratings from neighbors you rate highly
+            if neighbor not in node_rating or node_rating[neighbor] < rating_threshold:
+                continue
+            neighbor_ratings = G.nodes[neighbor]['rating']
+
+            for rated_node, score in neighbor_ratings.items():
+                if rated_node == node or rated_node == neighbor:
+                    continue  # skip self or mutual rating loops
+                if rated_node in node_rating:
+                    continue  # already rated → skip
+                if score >= rating_threshold:
+                    node_rating[rated_node] = 1
+                elif score <= -rating_threshold:
+                    node_rating[rated_node] = -1
+
+
+def generate_preimage():
+    return str(random.randint(100000, 999999))
+
+
+def hash_preimage(preimage):
+    return hashlib.sha256(preimage.encode()).hexdigest()
+
+
+# Lock funds forward, reveal the preimage backward; a malicious node refuses to reveal it and
+# every lock and credit is refunded. With use_ratings the sender rates the nodes on the path:
+# +1 for every node after a success, -1 for the node that broke the payment.
+def simulate_htlc_payment(G, path, preimage, amount, use_ratings=False):
+    mainSender = path[0]
+    if 'prepared_tables' in G.graph:
+        G.graph['prepared_tables'].invalidate_path(path) # balances on this path are about to change
+        G.graph['liquidity_cache'].bump_path(path)
+    # Step 0: Lock funds (forward direction)
+    locked_edges = []
+
+    # Step 1: Lock funds (forward direction)
+    for i in range(len(path) - 1):
+        u, v = path[i], path[i + 1]
+        G[u][v]['balance'] -= amount
+        locked_edges.append((u, v))  # Track for refund if needed in case of HTLC failure
+
+    # Step 2: Preimage revelation (backward) — simulate malicious behavior
+    knows_preimage = {node: False for node in path} # Initialize knowledge of preimage and every node starts with not knowing it
+    knows_preimage[path[-1]] = True  # Receiver knows it
+
+    reverse_credit = [] # To track balances to be credited in reverse direction
+    for i in range(1, len(path)):
+        receiver = path[-i]
+        sender = path[-i - 1]
+
+        if not knows_preimage[receiver] or not G.nodes[receiver]['honest']:
+            # Simulate malicious node refusing to cooperate
+            # Refund all previously locked balances
+            for u, v in locked_edges:
+                G[u][v]['balance'] += amount # this amount might be negative, becuase the some nodes might have lied during the MPC check
+            for x, y in reverse_credit:
+                G[x][y]['balance'] -= amount
+            if use_ratings:
+                rate_nodes(G, mainSender, [receiver], -1)
+            return False
+
+        knows_preimage[sender] = True
+        G[receiver][sender]['balance'] += amount
+        reverse_credit.append((receiver, sender))
+
+    if use_ratings:
+        # HTLC successful: update sender’s ratings
+        rate_nodes(G, mainSender, path[1:], 1)
+    if 'feasibility' in G.graph:
+        G.graph['feasibility'].update_path(path, amount)
+
+    return True
+
+
+# Same outcome, balances and ratings as simulate_htlc_payment without its bookkeeping. A
+# payment fails exactly when the backward reveal reaches a node that is not honest (every node
+# it reaches knows the preimage), and then every lock is refunded and every credit taken back,
+# so the balances are left as they were. The reveal is therefore checked first, on the path
+# from the receiver backwards, and only a successful payment touches the balances, in one pass
+# that debits every hop and credits its reverse edge. With realistic_crypto every node that
+# reveals the preimage checks it against the payment hash.
+def settle_htlc_payment(G, path, preimage, amount, use_ratings=False, realistic_crypto=False):
+    if 'prepared_tables' in G.graph:
+        G.graph['prepared_tables'].invalidate_path(path)
+        G.graph['liquidity_cache'].bump_path(path)
+    nodes = G.nodes
+    if realistic_crypto:
+        payment_hash = hash_preimage(preimage)
+    for i in range(len(path) - 1, 0, -1):
+        node = path[i]
+        if not nodes[node]['honest'] or (realistic_crypto and hash_preimage(preimage) != payment_hash):
+            if use_ratings:
+                rate_nodes(G, path[0], [node], -1)
+            return False
+
+    adj = G.succ
+    for u, v in zip(path, path[1:]):
+        adj[u][v]['balance'] -= amount
+        adj[v][u]['balance'] += amount
+    if use_ratings:
+        rate_nodes(G, path[0], path[1:], 1)
+    if 'feasibility' in G.graph:
+        G.graph['feasibility'].update_path(path, amount)
+    return True
+
+
+# params.transactions random payments, drawn one at a time from `random`
+def random_payments(num_nodes, params):
+    for _ in range(params.transactions):
+        node1 = random.randint(0, num_nodes - 1)
+        node2 = random.randint(0, num_nodes - 1)
+        while node1 == node2:
+            node2 = random.randint(0, num_nodes - 1)
+        yield node1, node2, random.randint(1, params.max_send_amount)
+
+
+# Payments of a stream (random_payments or a pre-drawn workload) on an existing network,
+# returns (successful HTLCs, failed HTLCs incl. local routing failures)
+def run_payments(G, strategy, params, payments, verbose=False):
+    use_mpc = strategy in ("mpc", "mpc_rating")
+    use_ratings = strategy in ("rating", "mpc_rating")
+    Sucessful_HTLC = 0
+    Failed_HTLC = 0
+    find_path = find_valid_path_with_mpc if use_mpc else find_valid_path_HTLC_Helper
+    settle, gossip = (settle_htlc_payment if params.lean_settlement else simulate_htlc_payment), update_ratings
+    crypto = (params.realistic_crypto,) if params.lean_settlement else ()
+    instruments = G.graph.get('instruments')  # Instrumentation.Instruments, timed wrappers
+    if instruments is not None:
+        find_path, settle, gossip = instruments.attach(G, find_path, settle, gossip)
+    i = -1
+    try:
+        for i, (node1, node2, amount) in enumerate(payments):
+            if verbose and strategy == "mpc_rating" and i % 1000 == 0:
+                print("Transaction:", i)
+            if use_ratings and params.rating_gossip and random.random() < params.node_rating_update_percentage:
+                gossip(G, params)
+
+            if use_mpc:
+                shortest_path = find_path(G, node1, node2, amount, params, use_ratings)
+            else:
+                shortest_path, local_failures = find_path(G, node1, node2, amount, params, use_ratings)
+                Failed_HTLC += local_failures
+            if shortest_path is not None:
+                if settle(G, shortest_path, generate_preimage(), amount, use_ratings, *crypto):
+                    Sucessful_HTLC += 1
+                else:
+                    Failed_HTLC += 1
+    finally:
+        if instruments is not None:  # also when a payment raises, so the router is restored
+            instruments.detach(G, i + 1)
+    return Sucessful_HTLC, Failed_HTLC
+
+
+# (sender, receiver, amount) tuples of a pre-drawn workload such as a Workload trace, converted
+# WORKLOAD_CHUNK rows at a time so a memory-mapped trace is never loaded as a whole
+def workload_payments(workload, chunk=WORKLOAD_CHUNK):
+    for start in range(0, len(workload), chunk):
+        rows = workload[start:start + chunk]
+        yield from zip(rows["sender"].tolist(), rows["receiver"].tolist(), rows["amount"].tolist())
+
+
+# ValueError if a pre-drawn workload names nodes the network does not have
+def check_workload_nodes(workload, num_nodes):
+    if len(workload) and (int(workload["sender"].max()) >= num_nodes or int(workload["receiver"].max()) >= num_nodes):
+        raise ValueError(f"workload has nodes outside 0..{num_nodes - 1}")
+
+
+# One sweep point of a strategy: fresh network, params.transactions random payments,
+# returns the success rate (%). A seed makes the run reproducible (e.g. in Sweep_Runner).
+# workload replaces the random payments with a pre-drawn (sender, receiver, amount) stream
+# such as a Workload trace, so every strategy can be run on exactly the same payments.
+# instruments (Instrumentation.Instruments) collects per-phase times and counters of the run.
+def run_simulation(strategy, malicious_percentage, params=None, seed=None, verbose=True, workload=None,
+                   instruments=None):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+    if params is None:
+        params = SimParams()
+    if params.routing not in ROUTING_MODES:
+        raise ValueError(f"Unknown routing {params.routing!r}, expected one of {ROUTING_MODES}")
+    use_mpc = strategy in ("mpc", "mpc_rating")
+    use_ratings = strategy in ("rating", "mpc_rating")
+    if seed is not None:
+        random.seed(seed)
+
+    G = create_pcn(params, ratings=use_ratings)
+    num_nodes = G.number_of_nodes()
+    make_malicious(G, malicious_percentage)
+    if instruments is not None:
+        G.graph['instruments'] = instruments
+    if workload is not None:
+        check_workload_nodes(workload, num_nodes)
+    payments = random_payments(num_nodes, params) if workload is None else workload_payments(workload)
+
+    start = time.time()
+    Sucessful_HTLC, Failed_HTLC = run_payments(G, strategy, params, payments, verbose)
+    end = time.time()
+
+    if verbose:
+        print("------ Malicious:,", malicious_percentage, "------")
+        print("Successful HTLCs:", Sucessful_HTLC)
+        print("Failed HTLCs:", Failed_HTLC)
+        print("Total HTLCs:", Sucessful_HTLC + Failed_HTLC)
+        print("Success Rate:", Sucessful_HTLC / (Sucessful_HTLC + Failed_HTLC) * 100 if (Sucessful_HTLC + Failed_HTLC) > 0 else 0, "%")
+        print("Time taken:", end - start, "seconds")
+        router = Router.get_router(G)
+        print("Router: searches", router.searches, "nodes expanded", router.expanded, "| repairs", router.repairs, "nodes expanded", router.repair_expanded)
+        if use_ratings:
+            print("Rating-pruned searches:", router.node_filtered_searches, "| repeated searches skipped after a rating rejection:", router.rating_searches_saved)
+        if use_mpc:
+            prepared_tables, liquidity_cache = get_mpc_caches(G, params)
+            print("Prepared MPC tables built:", prepared_tables.builds, "for", prepared_tables.queries, "comparisons")
+            print("Liquidity cache:", liquidity_cache.stats(), "-> MPC calls saved:", liquidity_cache.hits)
+        if 'route_cache' in G.graph:
+            print("Route cache:", G.graph['route_cache'].stats())
+        if 'feasibility' in G.graph:
+            print("Feasibility prefilter:", G.graph['feasibility'].stats())
+        store = G.graph.get('ratings')
+        if store is not None and store.rounds:
+            print("Rating rounds:", store.rounds, "nodes processed", store.nodes_processed, "of", store.rounds * num_nodes)
+        print("End of simulation")
+        print("===================================")
+    return round(Sucessful_HTLC / (Sucessful_HTLC + Failed_HTLC) * 100, 1)
+
+
+# The 13-point sweep every script runs: 0 to 30% malicious nodes in steps of 2.5%
+def run_sweep(strategy, params=None, num_points=13, step=0.025, verbose=True):
+    success_rates = []
+    malicious_percentage = 0
+    for _ in range(num_points):
+        success_rates.append(run_simulation(strategy, malicious_percentage, params, verbose=verbose))
+        malicious_percentage += step
+    return success_rates
+
+
+# Routes the same payments on the same network state (nothing is settled) with every routing
+# mode and counts the searches, private liquidity checks and paths found of each
+def compare_routing(G, params, workload, use_mpc=False):
+    router = Router.get_router(G)
+    results = {}
+    for routing in ROUTING_MODES:
+        mode_params = dataclasses.replace(params, routing=routing)
+        searches, mpc_checks = router.searches, G.graph.get('mpc_checks', 0)
+        found = 0
+        for sender, receiver, amount in workload:
+            if use_mpc:
+                path = find_valid_path_with_mpc(G, sender, receiver, amount, mode_params)
+            else:
+                path, _ = find_valid_path_HTLC_Helper(G, sender, receiver, amount, mode_params)
+            found += path is not None
+        results[routing] = {"searches": router.searches - searches,
+                            "mpc_checks": G.graph.get('mpc_checks', 0) - mpc_checks,
+                            "paths": found}
+    return results
+
+
+# settle_htlc_payment and simulate_htlc_payment give the same results, balances and ratings
+# for the same seeded run; returns the number of mismatches
+def check_lean_settlement(strategies=STRATEGIES, transactions=2000, malicious_percentage=0.2, seed=0):
+    mismatches = 0
+    for strategy in strategies:
+        runs = []
+        for lean in (False, True):
+            params = SimParams(transactions=transactions, lean_settlement=lean, realistic_crypto=lean)
+            random.seed(seed)
+            G = create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+            make_malicious(G, malicious_percentage)
+            result = run_payments(G, strategy, params, random_payments(G.number_of_nodes(), params))
+            ratings = [ratings_of(G, n) for n in G] if strategy in ("rating", "mpc_rating") else None
+            runs.append((result, list(G.edges(data='balance')), ratings))
+        mismatches += runs[0] != runs[1]
+    return mismatches
+
+
+if __name__ == "__main__":
+    print("Lean settlement mismatches:", check_lean_settlement())
+
+    # Per-payment settlement cost on the same paths (a third of them through a malicious node)
+    random.seed(0)
+    params = SimParams()
+    G = create_pcn(params)
+    make_malicious(G, 0.1)
+    paths = [path for path in (find_path_bfs(G, *random.sample(range(params.num_nodes), 2)) for _ in range(20000))
+             if path is not None]
+    preimages = [generate_preimage() for _ in paths]
+    for name, settle, extra in (("simulate_htlc_payment", simulate_htlc_payment, ()),
+                                ("settle_htlc_payment", settle_htlc_payment, ()),
+                                ("settle_htlc_payment, realistic crypto", settle_htlc_payment, (True,))):
+        start = time.perf_counter()
+        for path, preimage in zip(paths, preimages):
+            settle(G, path, preimage, 1, False, *extra)
+        print(f"{name:>38}: {(time.perf_counter() - start) / len(paths) * 1e6:.2f} us per payment")
+
+    for num_nodes in (100, 1000):
+        params = SimParams(num_nodes=num_nodes, num_channels=4 * num_nodes, use_liquidity_cache=False)
+        random.seed(0)
+        G = create_pcn(params)
+        make_malicious(G, 0.1)
+        workload = [(*random.sample(range(num_nodes), 2), random.randint(1, 10 * params.max_send_amount))
+                    for _ in range(2000)]
+        for use_mpc in (False, True):
+            print(f"{num_nodes} nodes, {'MPC' if use_mpc else 'baseline'} (searches / MPC checks / paths found):")
+            for routing, counts in compare_routing(G, params, workload, use_mpc).items():
+                print(f"  {routing:>8}: {counts['searches']:6d} / {counts['mpc_checks']:6d} / {counts['paths']:5d}")
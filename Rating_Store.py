@@ -0,0 +1,328 @@
+import bisect
+import heapq
+import numpy as np
+import random
+import scipy.sparse
+
+# Rating store: the rating every node keeps of every other node, as one N×N matrix
+#
+# Replaces the per-node dicts G.nodes[n]['rating'] (rater -> {rated node: score}).
+# "Not rated yet" is different from a score of 0, so the store keeps which entries are rated:
+#   dense  int32 score matrix + bool rated matrix (vectorized propagation, N² memory)
+#   sparse scipy.sparse.lil_matrix whose stored entries are exactly the rated ones (explicit
+#          zeros are kept), for large N such as the ~11k nodes of Nodes.csv
+# update_ratings gives exactly the same ratings as the dict version for the same random state:
+# nodes are processed in the same order and see the ratings already updated in this round.
+# Scores are int32 (SCORE_DTYPE): with int16 a hub rated after every payment wraps from 32767 to
+# -32768 on a long run and suddenly counts as low rated, which the dicts never do.
+#
+# The dense store propagates a node's ratings in one masked step over all of its trusted
+# neighbors (rows of the matrix) instead of one neighbor at a time: every not yet rated node takes
+# the score of the first trusted neighbor, in neighbor order, that rates it beyond the
+# threshold. An adoption can make a later neighbor trusted (it was not rated before); the step
+# then only keeps what the neighbors before that one adopted and continues from it, so the
+# result is exactly the sequential one.
+#
+# update_ratings_incremental only processes the nodes whose inputs changed since the last round:
+# a node whose own row changed (new trust in its neighbors) and the predecessors of such a node
+# (they read its row). Rows changed by add/add_many or by a round are kept in `dirty`. A node whose
+# row and neighbor rows did not change has already adopted everything it could, so with a fixed
+# threshold (min_threshold == max_threshold) the result equals a full round; with a random
+# threshold it only misses the adoptions a clean node would make after drawing a lower threshold.
+
+SCORE_DTYPE = np.int32
+
+
+class RatingStore:
+    def __init__(self, num_nodes, sparse=False):
+        self.num_nodes = num_nodes
+        self.sparse = sparse
+        if sparse:
+            self.matrix = scipy.sparse.lil_matrix((num_nodes, num_nodes), dtype=SCORE_DTYPE)
+            self.rows = self.matrix.rows  # sorted rated nodes of every rater
+            self.data = self.matrix.data  # matching scores
+        else:
+            self.score = np.zeros((num_nodes, num_nodes), dtype=SCORE_DTYPE)
+            self.rated = np.zeros((num_nodes, num_nodes), dtype=bool)
+        self.dirty = set()  # raters whose row changed since the last rating round
+        self.rounds = 0
+        self.nodes_processed = 0
+        self.adopted = 0  # ratings adopted from neighbors by rating rounds
+
+    # Independent copy (for forks of a network)
+    def copy(self):
+        other = RatingStore.__new__(RatingStore)
+        other.__dict__.update(self.__dict__)
+        if self.sparse:
+            other.matrix = self.matrix.copy()
+            other.rows, other.data = other.matrix.rows, other.matrix.data
+        else:
+            other.score = self.score.copy()
+            other.rated = self.rated.copy()
+        other.dirty = set(self.dirty)
+        return other
+
+    # Score rater gives node, None if not rated yet
+    def get(self, rater, node):
+        if self.sparse:
+            row = self.rows[rater]
+            k = bisect.bisect_left(row, node)
+            if k < len(row) and row[k] == node:
+                return int(self.data[rater][k])
+            return None
+        if self.rated[rater, node]:
+            return int(self.score[rater, node])
+        return None
+
+    # First rating is delta (+1 success / -1 failure), afterwards delta is added
+    def add(self, rater, node, delta):
+        self.dirty.add(rater)
+        if self.sparse:
+            row = self.rows[rater]
+            k = bisect.bisect_left(row, node)
+            if k < len(row) and row[k] == node:
+                self.data[rater][k] += delta
+            else:
+                row.insert(k, node)
+                self.data[rater].insert(k, delta)
+            return
+        # unrated entries hold 0, so adding works for both cases
+        self.score[rater, node] += delta
+        self.rated[rater, node] = True
+
+    # Same as add for every node in nodes (distinct), as one array write in the dense store
+    def add_many(self, rater, nodes, delta):
+        self.dirty.add(rater)
+        if self.sparse:
+            for node in nodes:
+                self.add(rater, node, delta)
+            return
+        nodes = np.asarray(nodes)
+        self.score[rater, nodes] += delta
+        self.rated[rater, nodes] = True
+
+    # Ratings of one rater as a {node: score} dict, like G.nodes[rater]['rating']
+    def ratings_of(self, rater):
+        if self.sparse:
+            return dict(zip(self.rows[rater], (int(x) for x in self.data[rater])))
+        nodes = np.flatnonzero(self.rated[rater])
+        return dict(zip(nodes.tolist(), self.score[rater, nodes].tolist()))
+
+    # Nodes rater has rated with a score <= threshold, as a set
+    def nodes_rated_at_most(self, rater, threshold):
+        if self.sparse:
+            return {node for node, score in zip(self.rows[rater], self.data[rater]) if score <= threshold}
+        return set(np.flatnonzero(self.rated[rater] & (self.score[rater] <= threshold)).tolist())
+
+    def memory_bytes(self):
+        if self.sparse:
+            entries = sum(len(row) for row in self.rows)
+            return entries * (8 + 4)  # node index + int32 score, ignoring list overhead
+        return self.score.nbytes + self.rated.nbytes
+
+    # Rating gossip: every node adopts +1/-1 opinions of the nodes it has not rated yet from
+    # the neighbors it trusts (rated >= a random threshold in [min_threshold, max_threshold]).
+    # neighbors[n] must list the successors of n in the graph's order (G.neighbors / router.succ).
+    def update_ratings(self, neighbors, min_threshold, max_threshold):
+        propagate = self._propagate_sparse if self.sparse else self._propagate_dense
+        if not self.sparse:
+            neighbors = self._neighbor_arrays(neighbors)
+        changed = set()
+        for node in range(self.num_nodes):
+            rating_threshold = random.randint(min_threshold, max_threshold)
+            if propagate(node, neighbors[node], rating_threshold):
+                changed.add(node)
+        self.dirty = changed
+        self.rounds += 1
+        self.nodes_processed += self.num_nodes
+
+    # Same round restricted to the dirty nodes and their predecessors (predecessors[n] lists the
+    # nodes that have n as a neighbor, e.g. router.pred). Nodes still go in increasing order, and
+    # a node that changes puts its not yet processed predecessors in this round like a full round.
+    def update_ratings_incremental(self, neighbors, predecessors, min_threshold, max_threshold):
+        propagate = self._propagate_sparse if self.sparse else self._propagate_dense
+        if not self.sparse:
+            neighbors = self._neighbor_arrays(neighbors)
+        queued = set(self.dirty)
+        for node in self.dirty:
+            queued.update(predecessors[node])
+        heap = list(queued)
+        heapq.heapify(heap)
+        changed = set()
+        while heap:
+            node = heapq.heappop(heap)
+            rating_threshold = random.randint(min_threshold, max_threshold)
+            self.nodes_processed += 1
+            if not propagate(node, neighbors[node], rating_threshold):
+                continue
+            changed.add(node)
+            for predecessor in predecessors[node]:
+                if predecessor > node and predecessor not in queued:
+                    queued.add(predecessor)
+                    heapq.heappush(heap, predecessor)
+        self.dirty = changed
+        self.rounds += 1
+
+    # Neighbor lists as index arrays, converted once per neighbors object (router.succ is static)
+    def _neighbor_arrays(self, neighbors):
+        if getattr(self, "_neighbors", None) is not neighbors:
+            self._neighbors = neighbors
+            self._arrays = [np.asarray(n, dtype=np.intp) for n in neighbors]
+        return self._arrays
+
+    # One node of a round, returns True if it adopted new ratings
+    def _propagate_dense(self, node, neighbors, rating_threshold):
+        score, rated = self.score, self.rated
+        node_rated = rated[node]  # views, written in place
+        node_score = score[node]
+        if not node_rated.any():
+            return False  # no trust yet, skip
+        changed = False
+        start = 0
+        while start < len(neighbors):
+            rest = neighbors[start:]
+            # Only trust ratings from neighbors you rate highly
+            trusted = node_rated[rest] & (node_score[rest] >= rating_threshold)
+            rows = rest[trusted]
+            if not len(rows):
+                break
+            # nodes a trusted neighbor rated beyond the threshold and this node has not,
+            # except self and the neighbor
+            scores = score[rows]
+            new = rated[rows] & ~node_rated & ((scores >= rating_threshold) | (scores <= -rating_threshold))
+            new[:, node] = False
+            new[np.arange(len(rows)), rows] = False
+            columns = np.flatnonzero(new.any(axis=0))
+            if not len(columns):
+                break
+            first = new[:, columns].argmax(axis=0)  # first trusted neighbor rating each node
+            values = np.where(scores[first, columns] >= rating_threshold, 1, -1)
+            positions = np.flatnonzero(trusted)[first]
+
+            # an untrusted neighbor adopted with a trusted score by an earlier neighbor is trusted
+            # from its own position on: keep the adoptions before it and continue from there
+            stop = len(rest)
+            untrusted = np.flatnonzero(~trusted)
+            if len(untrusted):
+                index = np.minimum(np.searchsorted(columns, rest[untrusted]), len(columns) - 1)
+                flips = untrusted[(columns[index] == rest[untrusted]) & (values[index] >= rating_threshold)
+                                  & (positions[index] < untrusted)]
+                if len(flips):
+                    stop = int(flips[0])
+                    keep = positions < stop
+                    columns, values = columns[keep], values[keep]
+            node_score[columns] = values
+            node_rated[columns] = True
+            self.adopted += len(columns)
+            changed = True
+            start += stop
+        return changed
+
+    def _propagate_sparse(self, node, neighbors, rating_threshold):
+        rows, data = self.rows, self.data
+        if not rows[node]:
+            return False  # no trust yet, skip
+        node_rating = dict(zip(rows[node], data[node]))
+        changed = False
+
+        for neighbor in neighbors:
+            if neighbor not in node_rating or node_rating[neighbor] < rating_threshold:
+                continue
+            for rated_node, score in zip(rows[neighbor], data[neighbor]):
+                if rated_node == node or rated_node == neighbor or rated_node in node_rating:
+                    continue
+                if score >= rating_threshold:
+                    node_rating[rated_node] = 1
+                    changed = True
+                elif score <= -rating_threshold:
+                    node_rating[rated_node] = -1
+                    changed = True
+
+        if changed:
+            self.adopted += len(node_rating) - len(rows[node])
+            rated_nodes = sorted(node_rating)
+            rows[node] = rated_nodes
+            data[node] = [node_rating[n] for n in rated_nodes]
+        return changed
+
+    # Scores as a scipy CSR matrix (stored entries = rated, explicit zeros included)
+    def to_scipy(self):
+        if self.sparse:
+            return self.matrix.tocsr()
+        nodes, rated_nodes = np.nonzero(self.rated)
+        return scipy.sparse.csr_matrix((self.score[nodes, rated_nodes], (nodes, rated_nodes)),
+                                       shape=self.score.shape, dtype=SCORE_DTYPE)
+
+
+if __name__ == "__main__":
+    import dataclasses
+    import time
+    import PCN_Sim
+
+    # Same seed, same payments, rating gossip every 20 payments: the three stores must agree
+    def run(rating_store, params, transactions=3000, update_every=20, seed=3):
+        params = dataclasses.replace(params, rating_store=rating_store)
+        random.seed(seed)
+        G = PCN_Sim.create_pcn(params, ratings=True)
+        PCN_Sim.make_malicious(G, 0.2)
+        n = G.number_of_nodes()
+        update_time = 0.0
+        for i in range(transactions):
+            sender, receiver = random.sample(range(n), 2)
+            amount = random.randint(1, params.max_send_amount)
+            path, _ = PCN_Sim.find_valid_path_HTLC_Helper(G, sender, receiver, amount, params, use_ratings=True)
+            if path is not None:
+                PCN_Sim.simulate_htlc_payment(G, path, PCN_Sim.generate_preimage(), amount, use_ratings=True)
+            if i % update_every == 0:
+                start = time.perf_counter()
+                PCN_Sim.update_ratings(G, params)
+                update_time += time.perf_counter() - start
+        return [PCN_Sim.ratings_of(G, node) for node in range(n)], update_time
+
+    params = PCN_Sim.SimParams(incremental_rating_updates=False)
+    expected, dict_time = run("dict", params)
+    for rating_store in ("dense", "sparse"):
+        ratings, store_time = run(rating_store, params)
+        print(f"{rating_store:>6}: identical to dict ratings: {ratings == expected}"
+              f" | update_ratings {store_time:.3f} s vs dict {dict_time:.3f} s")
+
+    # Gossip before every payment, full rounds vs dirty-set rounds. Payments come from their own
+    # generator so both runs see the same payments; with a fixed threshold the ratings must match.
+    def run_gossip(params, transactions=3000, seed=5):
+        payments = random.Random(seed)
+        random.seed(seed)
+        G = PCN_Sim.create_pcn(params, ratings=True)
+        PCN_Sim.make_malicious(G, 0.2)
+        n = G.number_of_nodes()
+        start = time.perf_counter()
+        for _ in range(transactions):
+            PCN_Sim.update_ratings(G, params)
+            sender, receiver = payments.sample(range(n), 2)
+            amount = payments.randint(1, params.max_send_amount)
+            path, _ = PCN_Sim.find_valid_path_HTLC_Helper(G, sender, receiver, amount, params, use_ratings=True)
+            if path is not None:
+                PCN_Sim.simulate_htlc_payment(G, path, PCN_Sim.generate_preimage(), amount, use_ratings=True)
+        store = G.graph['ratings']
+        return [store.ratings_of(node) for node in range(n)], time.perf_counter() - start, store.nodes_processed
+
+    for rating_store in ("dense", "sparse"):
+        params = PCN_Sim.SimParams(rating_store=rating_store, min_rating_threshold=1, max_rating_threshold=1)
+        full, full_time, full_nodes = run_gossip(dataclasses.replace(params, incremental_rating_updates=False))
+        incremental, incremental_time, incremental_nodes = run_gossip(params)
+        print(f"{rating_store:>6} per-payment gossip: incremental identical to full: {incremental == full}"
+              f" | {incremental_time:.2f} s vs {full_time:.2f} s, nodes processed {incremental_nodes} vs {full_nodes}")
+
+    # Nodes.csv scale: the sparse store keeps memory proportional to the ratings
+    params = PCN_Sim.SimParams(topology="lightning", incremental_rating_updates=False)
+    random.seed(0)
+    G = PCN_Sim.create_pcn(dataclasses.replace(params, rating_store="sparse"), ratings=True)
+    store = G.graph['ratings']
+    for _ in range(20000):
+        sender, receiver = random.sample(range(store.num_nodes), 2)
+        path = PCN_Sim.find_path_bfs(G, sender, receiver)
+        if path is not None:
+            store.add_many(sender, path[1:], 1)
+    start = time.perf_counter()
+    PCN_Sim.update_ratings(G, params)
+    print(f"{store.num_nodes} nodes: sparse update_ratings {time.perf_counter() - start:.3f} s,"
+          f" {store.memory_bytes() / 1e6:.1f} MB (dense would need {store.num_nodes ** 2 * 5 / 1e6:.0f} MB)")
@@ -0,0 +1,145 @@
+import sys
+from array import array
+from collections import OrderedDict
+
+# Cache of first route candidates on the static topology
+#
+# Only balances change during a simulation, so the first search of a payment (nothing excluded
+# yet) always gives the same path for the same sender and receiver. The cache keeps
+#   "pairs"  the router's path for every (sender, receiver): exactly the path find_path_bfs
+#            returns, so results do not change. Searches that skip low-rated nodes
+#            (rating_pruned_search) depend on the sender's current ratings and go to the
+#            router (counted as bypassed).
+#   "trees"  one BFS tree per sender (a parent per node); the path to any receiver is read off
+#            the tree. It is a shortest path, but not always the one the bidirectional search
+#            picks among paths of the same length. A tree path through a low-rated node is
+#            bypassed (the pruned search is run); one that avoids them is still shortest.
+# Entries are kept in LRU order and evicted once their estimated size exceeds max_bytes. Later
+# attempts of a payment (hops excluded) always search with the exclusions.
+
+MODES = ("pairs", "trees")
+ENTRY_OVERHEAD = 120 # bytes per entry besides the path / parent array: key and OrderedDict link
+
+
+class RouteCache:
+    def __init__(self, router, mode="pairs", max_bytes=16 * 2 ** 20):
+        if mode not in MODES:
+            raise ValueError(f"Unknown route cache mode {mode!r}, expected one of {MODES}")
+        self.router = router
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (sender, receiver) -> path tuple or None / sender -> parents
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    # First route candidate from sender to receiver, skipping exclude_nodes
+    def path(self, sender, receiver, exclude_nodes=None):
+        if self.mode == "pairs":
+            if exclude_nodes:
+                self.bypassed += 1
+                return self.router.shortest_path(sender, receiver, None, exclude_nodes)
+            key = (sender, receiver)
+            path = self.entries.get(key, False)
+            if path is not False:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return list(path) if path is not None else None
+            self.misses += 1
+            path = self.router.shortest_path(sender, receiver)
+            self._store(key, tuple(path) if path is not None else None)
+            return path
+
+        if sender == receiver or not (0 <= receiver < self.router.num_nodes):
+            return self.router.shortest_path(sender, receiver, None, exclude_nodes)
+        parents = self.entries.get(sender)
+        if parents is not None:
+            self.hits += 1
+            self.entries.move_to_end(sender)
+        else:
+            self.misses += 1
+            parents = self._bfs_tree(sender)
+            self._store(sender, parents)
+        if parents[receiver] < 0:
+            return None
+        path = [receiver]
+        while path[-1] != sender:
+            path.append(parents[path[-1]])
+        path.reverse()
+        if exclude_nodes and not exclude_nodes.isdisjoint(path):
+            self.bypassed += 1
+            return self.router.shortest_path(sender, receiver, None, exclude_nodes)
+        return path
+
+    # Parent of every node in a BFS from sender over the whole topology, -1 if unreachable
+    def _bfs_tree(self, sender):
+        succ = self.router.succ
+        parents = array('i', [-1]) * self.router.num_nodes
+        parents[sender] = sender
+        fringe = [sender]
+        while fringe:
+            next_fringe = []
+            for v in fringe:
+                for w in succ[v]:
+                    if parents[w] < 0:
+                        parents[w] = v
+                        next_fringe.append(w)
+            fringe = next_fringe
+        return parents
+
+    def _store(self, key, value):
+        self.entries[key] = value
+        self.bytes += sys.getsizeof(value) + ENTRY_OVERHEAD
+        while self.bytes > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= sys.getsizeof(evicted) + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+        }
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    import PCN_Sim
+    import Workload
+
+    # Seeded sweep points with and without the cache: "pairs" must not change any result
+    for num_nodes, transactions in ((100, 10000), (1000, 20000)):
+        for strategy in PCN_Sim.STRATEGIES:
+            row = f"{num_nodes:>5} nodes {strategy:>10}:"
+            for mode in (None, "pairs", "trees"):
+                params = PCN_Sim.SimParams(num_nodes=num_nodes, num_channels=4 * num_nodes,
+                                           transactions=transactions, route_cache=mode)
+                random.seed(0)
+                G = PCN_Sim.create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+                PCN_Sim.make_malicious(G, 0.1)
+                payments = Workload.workload_for(params, seed=1)
+                start = time.perf_counter()
+                successful, failed = PCN_Sim.run_payments(G, strategy, params, PCN_Sim.workload_payments(payments))
+                elapsed = time.perf_counter() - start
+                row += f" | {mode or 'none'} {successful / (successful + failed) * 100:.1f}% {elapsed:.2f} s"
+                if mode:
+                    stats = G.graph['route_cache'].stats()
+                    row += f" hit rate {stats['hit_rate']:.2f} bypassed {stats['bypassed']}"
+            print(row)
+
+    # A small memory budget keeps evicting
+    params = PCN_Sim.SimParams(transactions=5000, route_cache="pairs", route_cache_bytes=64 * 1024)
+    random.seed(0)
+    G = PCN_Sim.create_pcn(params)
+    PCN_Sim.run_payments(G, "baseline", params, PCN_Sim.random_payments(G.number_of_nodes(), params))
+    print("64 KiB budget:", G.graph['route_cache'].stats())
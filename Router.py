@@ -0,0 +1,490 @@
+import networkx as nx
+import heapq
+import random
+import time
+from collections import deque
+
+# Exclusion-aware shortest path routing for the payment channel network
+#
+# find_path_bfs in the scripts builds a new nx.subgraph_view with a Python lambda per edge on
+# every retry. BFSRouter does the same bidirectional BFS as nx.shortest_path (same visiting
+# order, so the same path for the same graph and excluded edges) directly on adjacency lists
+# taken once from the graph, with the excluded (u, v) pairs checked natively and the
+# visited/parent buffers allocated once and reused through a generation stamp.
+# Nodes can be excluded as well (exclude_nodes, e.g. the nodes the sender rates too low),
+# which gives the same path as nx.shortest_path on a subgraph_view with filter_node.
+# Two balance-aware searches read the live 'balance' edge attributes of the graph:
+#   shortest_path(..., min_balance=amount)  one pass over the edges that can carry the amount
+#   widest_path                             max-bottleneck path (Dijkstra with a max-heap on
+#                                           the bottleneck), an upper bound for any router
+# The topology must not change after the router is built (only balances do in the scripts).
+# Nodes must be 0..n-1, as in create_pcn.
+
+
+class BFSRouter:
+    def __init__(self, G):
+        n = G.number_of_nodes()
+        self.num_nodes = n
+        self.succ = [list(G.succ[v]) for v in range(n)]
+        self.pred = [list(G.pred[v]) for v in range(n)]
+        self.adj = G.succ  # live edge attributes, for the balance-aware searches
+
+        # Search buffers, valid only where the mark equals the current stamp
+        self.stamp = 0
+        self.forward_mark = [0] * n
+        self.reverse_mark = [0] * n
+        self.forward_parent = [0] * n
+        self.reverse_parent = [0] * n
+
+        # Work counters: nodes whose neighbors were scanned, by full searches and by repairs
+        self.searches = 0
+        self.expanded = 0
+        self.repairs = 0
+        self.repair_expanded = 0
+        self.node_filtered_searches = 0  # searches that excluded at least one node
+        self.rating_searches_saved = 0  # repeated searches the rating check no longer runs (PCN_Sim)
+        self.hops_checked = 0  # hops of found paths checked for balance / liquidity (PCN_Sim)
+
+    # Router for a fork of the graph (same topology, own balances): shares the adjacency lists,
+    # gets its own search buffers and counters and reads the balances of G
+    def fork(self, G):
+        router = BFSRouter.__new__(BFSRouter)
+        router.__dict__.update(self.__dict__)
+        n = self.num_nodes
+        router.adj = G.succ
+        router.stamp = 0
+        router.forward_mark, router.reverse_mark = [0] * n, [0] * n
+        router.forward_parent, router.reverse_parent = [0] * n, [0] * n
+        router.searches = router.expanded = router.repairs = router.repair_expanded = 0
+        router.node_filtered_searches = router.rating_searches_saved = router.hops_checked = 0
+        return router
+
+    # Incremental search from sender, repaired after every excluded edge (see IncrementalSearch)
+    def incremental(self, sender, exclude_nodes=None):
+        return IncrementalSearch(self, sender, exclude_nodes)
+
+    # Shortest path from sender to receiver avoiding the (u, v) pairs in exclude_edges and the
+    # nodes in exclude_nodes (never the sender; an excluded receiver has no path), or None.
+    # With min_balance, only edges whose balance is >= min_balance are used.
+    def shortest_path(self, sender, receiver, exclude_edges=None, exclude_nodes=None, min_balance=None):
+        if not (0 <= sender < self.num_nodes and 0 <= receiver < self.num_nodes):
+            return None
+        if sender == receiver:
+            return [sender]
+        if exclude_nodes:
+            if receiver in exclude_nodes:
+                return None
+            self.node_filtered_searches += 1
+        else:
+            exclude_nodes = None
+
+        # excluded edges indexed by tail (forward search) and by head (reverse search)
+        blocked_out = {}
+        blocked_in = {}
+        if exclude_edges:
+            for u, v in exclude_edges:
+                blocked_out.setdefault(u, set()).add(v)
+                blocked_in.setdefault(v, set()).add(u)
+
+        self.stamp += 1
+        stamp = self.stamp
+        forward_mark, reverse_mark = self.forward_mark, self.reverse_mark
+        forward_parent, reverse_parent = self.forward_parent, self.reverse_parent
+        succ, pred, adj = self.succ, self.pred, self.adj
+
+        forward_mark[sender] = stamp
+        forward_parent[sender] = -1
+        reverse_mark[receiver] = stamp
+        reverse_parent[receiver] = -1
+        forward_fringe = [sender]
+        reverse_fringe = [receiver]
+        meet = -1
+        expanded = 0
+        while forward_fringe and reverse_fringe and meet < 0:
+            if len(forward_fringe) <= len(reverse_fringe):
+                this_level = forward_fringe
+                forward_fringe = []
+                for v in this_level:
+                    expanded += 1
+                    blocked = blocked_out.get(v)
+                    for w in succ[v]:
+                        if blocked and w in blocked:
+                            continue
+                        if exclude_nodes and w in exclude_nodes:
+                            continue
+                        if min_balance is not None and adj[v][w]['balance'] < min_balance:
+                            continue
+                        if forward_mark[w] != stamp:
+                            forward_mark[w] = stamp
+                            forward_parent[w] = v
+                            forward_fringe.append(w)
+                        if reverse_mark[w] == stamp:
+                            meet = w
+                            break
+                    if meet >= 0:
+                        break
+            else:
+                this_level = reverse_fringe
+                reverse_fringe = []
+                for v in this_level:
+                    expanded += 1
+                    blocked = blocked_in.get(v)
+                    for w in pred[v]:
+                        if blocked and w in blocked:
+                            continue
+                        if exclude_nodes and w in exclude_nodes and w != sender:
+                            continue
+                        if min_balance is not None and adj[w][v]['balance'] < min_balance:
+                            continue
+                        if reverse_mark[w] != stamp:
+                            reverse_mark[w] = stamp
+                            reverse_parent[w] = v
+                            reverse_fringe.append(w)
+                        if forward_mark[w] == stamp:
+                            meet = w
+                            break
+                    if meet >= 0:
+                        break
+        self.searches += 1
+        self.expanded += expanded
+        if meet < 0:
+            return None
+
+        path = []
+        w = meet
+        while w >= 0:
+            path.append(w)
+            w = forward_parent[w]
+        path.reverse()
+        w = reverse_parent[meet]
+        while w >= 0:
+            path.append(w)
+            w = reverse_parent[w]
+        return path
+
+    # Path from sender to receiver whose smallest balance is as large as possible, avoiding the
+    # nodes in exclude_nodes. Returns (path, bottleneck balance), (None, 0) if unreachable.
+    def widest_path(self, sender, receiver, exclude_nodes=None):
+        if not (0 <= sender < self.num_nodes and 0 <= receiver < self.num_nodes):
+            return None, 0
+        if sender == receiver:
+            return [sender], 0
+        if exclude_nodes and receiver in exclude_nodes:
+            return None, 0
+
+        parent = self.forward_parent  # only read along the found path, all written by this search
+        width = {sender: float('inf')}
+        parent[sender] = -1
+        heap = [(-width[sender], sender)]
+        expanded = 0
+        done = set()
+        succ, adj = self.succ, self.adj
+        while heap:
+            neg_width, v = heapq.heappop(heap)
+            if v in done:
+                continue
+            done.add(v)
+            if v == receiver:
+                break
+            expanded += 1
+            current = -neg_width
+            for w in succ[v]:
+                if w in done or (exclude_nodes and w in exclude_nodes):
+                    continue
+                bottleneck = min(current, adj[v][w]['balance'])
+                if bottleneck > width.get(w, 0):
+                    width[w] = bottleneck
+                    parent[w] = v
+                    heapq.heappush(heap, (-bottleneck, w))
+        self.searches += 1
+        self.expanded += expanded
+        if receiver not in done:
+            return None, 0
+
+        path = []
+        w = receiver
+        while w >= 0:
+            path.append(w)
+            w = parent[w]
+        path.reverse()
+        return path, width[receiver]
+
+
+# Routing mode that keeps the BFS layering of the sender between attempts.
+# The first attempt is a full BFS from the sender (dist = hop distance of every node).
+# Excluding an edge (u, v) only changes distances if it was the last edge giving v its
+# distance; then only v and the nodes that relied on it are re-layered, everything else is
+# kept. path_to() returns a shortest path over the remaining edges from the layering.
+# Excluded nodes are never layered, so they stay unreachable through every repair.
+class IncrementalSearch:
+    def __init__(self, router, sender, exclude_nodes=None):
+        self.router = router
+        self.sender = sender
+        self.excluded = set()
+        self.dist = [-1] * router.num_nodes
+        self.dist[sender] = 0
+
+        dist, succ = self.dist, router.succ
+        fringe = [sender]
+        expanded = 0
+        while fringe:
+            next_fringe = []
+            for v in fringe:
+                expanded += 1
+                for w in succ[v]:
+                    if dist[w] < 0 and not (exclude_nodes and w in exclude_nodes):
+                        dist[w] = dist[v] + 1
+                        next_fringe.append(w)
+            fringe = next_fringe
+        router.searches += 1
+        router.expanded += expanded
+        self.expanded_per_attempt = [expanded]  # nodes expanded by the first search and by every repair
+
+    def path_to(self, receiver):
+        dist, pred, excluded = self.dist, self.router.pred, self.excluded
+        if not (0 <= receiver < len(dist)) or dist[receiver] < 0:
+            return None
+        path = [receiver]
+        x = receiver
+        while x != self.sender:
+            for p in pred[x]:
+                if dist[p] == dist[x] - 1 and (p, x) not in excluded:
+                    x = p
+                    break
+            path.append(x)
+        path.reverse()
+        return path
+
+    # v keeps its distance if another non-excluded, non-affected in-edge comes from the layer above
+    def _supported(self, v, affected):
+        dist, excluded = self.dist, self.excluded
+        for p in self.router.pred[v]:
+            if dist[p] == dist[v] - 1 and p not in affected and (p, v) not in excluded:
+                return True
+        return False
+
+    def exclude(self, u, v):
+        router = self.router
+        dist, succ, pred, excluded = self.dist, router.succ, router.pred, self.excluded
+        excluded.add((u, v))
+        router.repairs += 1
+        if dist[u] < 0 or dist[v] != dist[u] + 1 or self._supported(v, ()):
+            self.expanded_per_attempt.append(0)
+            return
+
+        # 1. nodes whose distance has to grow: v and, level by level, the children left without support
+        affected = {v}
+        queue = deque([v])
+        expanded = 0
+        while queue:
+            x = queue.popleft()
+            expanded += 1
+            for w in succ[x]:
+                if w in affected or (x, w) in excluded:
+                    continue
+                if dist[w] == dist[x] + 1 and not self._supported(w, affected):
+                    affected.add(w)
+                    queue.append(w)
+
+        # 2. re-layer the affected nodes from their unaffected in-neighbors (unit-weight Dijkstra)
+        heap = []
+        for x in affected:
+            best = -1
+            for p in pred[x]:
+                if p not in affected and dist[p] >= 0 and (p, x) not in excluded:
+                    if best < 0 or dist[p] + 1 < best:
+                        best = dist[p] + 1
+            if best > 0:
+                heap.append((best, x))
+        for x in affected:
+            dist[x] = -1
+        heapq.heapify(heap)
+        while heap:
+            d, x = heapq.heappop(heap)
+            if dist[x] >= 0:
+                continue
+            dist[x] = d
+            expanded += 1
+            for w in succ[x]:
+                if w in affected and dist[w] < 0 and (x, w) not in excluded:
+                    heapq.heappush(heap, (d + 1, w))
+
+        router.repair_expanded += expanded
+        self.expanded_per_attempt.append(expanded)
+
+
+# Router of a graph, built on first use and kept in G.graph
+def get_router(G):
+    router = G.graph.get('router')
+    if router is None:
+        router = BFSRouter(G)
+        G.graph['router'] = router
+    return router
+
+
+# Randomized check that BFSRouter returns the same path as nx.shortest_path on a subgraph_view
+# without the excluded edges and nodes
+def check_same_paths(num_nodes=200, num_channels=800, trials=2000, seed=0):
+    rng = random.Random(seed)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(num_nodes))
+    while G.number_of_edges() < 2 * num_channels:
+        u, v = rng.sample(range(num_nodes), 2)
+        if not G.has_edge(u, v):
+            G.add_edge(u, v)
+            G.add_edge(v, u)
+    router = BFSRouter(G)
+    all_edges = list(G.edges())
+    mismatches = 0
+    for _ in range(trials):
+        sender, receiver = rng.sample(range(num_nodes), 2)
+        exclude_edges = set(rng.sample(all_edges, rng.randint(0, 10)))
+        exclude_nodes = set(rng.sample(range(num_nodes), rng.choice((0, 0, 5, 20)))) - {sender, receiver}
+        view = nx.subgraph_view(G, filter_node=lambda x: x not in exclude_nodes,
+                                filter_edge=lambda u, v: (u, v) not in exclude_edges)
+        try:
+            expected = nx.shortest_path(view, sender, receiver)
+        except nx.NetworkXNoPath:
+            expected = None
+        if router.shortest_path(sender, receiver, exclude_edges, exclude_nodes) != expected:
+            mismatches += 1
+    return mismatches
+
+
+# Randomized check of the balance-aware searches against networkx: the capacity-filtered path
+# equals nx.shortest_path on the edges with enough balance, and the widest path's bottleneck
+# equals the largest amount for which such a path exists (its own bottleneck is recomputed)
+def check_balance_searches(num_nodes=200, num_channels=800, trials=1000, max_balance=1000, seed=0):
+    rng = random.Random(seed)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(num_nodes))
+    while G.number_of_edges() < 2 * num_channels:
+        u, v = rng.sample(range(num_nodes), 2)
+        G.add_edge(u, v, balance=rng.randint(1, max_balance))
+        G.add_edge(v, u, balance=rng.randint(1, max_balance))
+    router = BFSRouter(G)
+    balances = sorted({b for _, _, b in G.edges(data='balance')})
+    mismatches = 0
+    for _ in range(trials):
+        sender, receiver = rng.sample(range(num_nodes), 2)
+        amount = rng.randint(1, max_balance)
+        view = nx.subgraph_view(G, filter_edge=lambda u, v: G[u][v]['balance'] >= amount)
+        try:
+            expected = nx.shortest_path(view, sender, receiver)
+        except nx.NetworkXNoPath:
+            expected = None
+        if router.shortest_path(sender, receiver, min_balance=amount) != expected:
+            mismatches += 1
+
+        path, width = router.widest_path(sender, receiver)
+        # largest balance threshold that still connects sender to receiver
+        low, high = 0, len(balances) - 1
+        best = 0
+        while low <= high:
+            mid = (low + high) // 2
+            if router.shortest_path(sender, receiver, min_balance=balances[mid]) is not None:
+                best = balances[mid]
+                low = mid + 1
+            else:
+                high = mid - 1
+        if width != best or (path is not None and min(G[u][v]['balance'] for u, v in zip(path, path[1:])) != width):
+            mismatches += 1
+    return mismatches
+
+
+# Randomized check that the repaired layering equals a fresh BFS after every exclusion
+def check_incremental_repair(num_nodes=200, num_channels=600, trials=200, seed=0):
+    rng = random.Random(seed)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(num_nodes))
+    while G.number_of_edges() < 2 * num_channels:
+        u, v = rng.sample(range(num_nodes), 2)
+        G.add_edge(u, v)
+        G.add_edge(v, u)
+    router = BFSRouter(G)
+    mismatches = 0
+    for _ in range(trials):
+        sender, receiver = rng.sample(range(num_nodes), 2)
+        exclude_nodes = set(rng.sample(range(num_nodes), rng.choice((0, 10)))) - {sender, receiver}
+        search = router.incremental(sender, exclude_nodes)
+        for _ in range(10):
+            path = search.path_to(receiver)
+            if path is None:
+                break
+            u, v = rng.choice(list(zip(path, path[1:])))
+            search.exclude(u, v)
+            view = nx.subgraph_view(G, filter_node=lambda x: x not in exclude_nodes,
+                                    filter_edge=lambda a, b: (a, b) not in search.excluded)
+            expected = nx.single_source_shortest_path_length(view, sender)
+            if any(search.dist[x] != expected.get(x, -1) for x in range(num_nodes)):
+                mismatches += 1
+    return mismatches
+
+
+# Nodes expanded per attempt when the first hop without enough balance is excluded and the
+# search retried: full bidirectional search every attempt vs incremental repair
+def compare_repair(G, workload, max_attempts=10):
+    router = BFSRouter(G)
+    modes = {"full": {}, "incremental": {}}
+    for sender, receiver, amount in workload:
+        for mode, per_attempt in modes.items():
+            excluded = set()
+            search = router.incremental(sender) if mode == "incremental" else None
+            for attempt in range(max_attempts):
+                if search is None:
+                    before = router.expanded
+                    path = router.shortest_path(sender, receiver, excluded)
+                    cost = router.expanded - before
+                else:
+                    path = search.path_to(receiver)
+                    cost = search.expanded_per_attempt[-1]
+                per_attempt.setdefault(attempt, []).append(cost)
+                if path is None:
+                    break
+                blocked = next(((u, v) for u, v in zip(path, path[1:]) if G[u][v]['balance'] < amount), None)
+                if blocked is None:
+                    break
+                excluded.add(blocked)
+                if search is not None:
+                    search.exclude(*blocked)
+    return {mode: {attempt + 1: sum(costs) / len(costs) for attempt, costs in sorted(per_attempt.items())}
+            for mode, per_attempt in modes.items()}
+
+
+if __name__ == "__main__":
+    print("Path mismatches against nx.shortest_path:", check_same_paths())
+    print("Layering mismatches after incremental repair:", check_incremental_repair())
+    print("Capacity-filtered / widest path mismatches:", check_balance_searches())
+
+    rng = random.Random(1)
+    G = nx.DiGraph()
+    G.add_nodes_from(range(1000))
+    while G.number_of_edges() < 8000:
+        u, v = rng.sample(range(1000), 2)
+        G.add_edge(u, v)
+        G.add_edge(v, u)
+    queries = [(*rng.sample(range(1000), 2), set(rng.sample(list(G.edges()), 5))) for _ in range(2000)]
+
+    start = time.perf_counter()
+    for sender, receiver, exclude_edges in queries:
+        view = nx.subgraph_view(G, filter_edge=lambda u, v: (u, v) not in exclude_edges)
+        nx.shortest_path(view, sender, receiver)
+    nx_time = time.perf_counter() - start
+
+    router = BFSRouter(G)
+    start = time.perf_counter()
+    for sender, receiver, exclude_edges in queries:
+        router.shortest_path(sender, receiver, exclude_edges)
+    router_time = time.perf_counter() - start
+    print(f"subgraph_view + shortest_path: {len(queries) / nx_time:.0f} searches/s")
+    print(f"BFSRouter:                     {len(queries) / router_time:.0f} searches/s")
+
+    import PCN_Graph
+    import PCN_Sim
+    random.seed(2)
+    G = PCN_Graph.to_networkx(PCN_Graph.create_pcn(PCN_Sim.SimParams(num_nodes=1000, num_channels=4000)))
+    workload = [(*random.sample(range(1000), 2), random.randint(300, 900)) for _ in range(500)]
+    print("Average nodes expanded per attempt (attempt: full / incremental):")
+    result = compare_repair(G, workload)
+    for attempt in result["full"]:
+        print(f"  {attempt:>2}: {result['full'][attempt]:8.1f} / {result['incremental'].get(attempt, 0):8.1f}")
@@ -0,0 +1,192 @@
+import networkx as nx
+import numpy as np
+import random
+import time
+import zipfile
+import PCN_Graph
+import PCN_Sim
+import Rating_Store
+
+# Snapshot / restore of a simulated network
+#
+# A snapshot is one uncompressed .npz file of flat arrays:
+#   tails, heads, balance  every directed channel, in an order that gives back the same
+#                          successor and predecessor order in networkx (so the router finds the
+#                          same paths after a restore, see PCN_Graph.CSRGraph.insertion_order)
+#   honest                 one flag per node
+#   rating_*               the ratings: score/rated matrices for the dense store, CSR arrays
+#                          (indptr, indices, data) for the sparse store and the rating dicts,
+#                          plus the store's dirty set
+# The members are stored uncompressed, so load_snapshot can memory-map them straight from the
+# file (copy-on-write: a restored graph can be changed without touching the snapshot). Only
+# the state is saved; the router and MPC caches are rebuilt on first use (building prepared
+# MPC tables draws from `random`, so a run continues identically only from cold caches).
+
+RATING_KINDS = ("none", "dict", "dense", "sparse")
+
+
+def save_snapshot(G, path):
+    num_nodes = G.number_of_nodes()
+    g = PCN_Graph.from_networkx(G)
+    order = np.asarray(g.insertion_order(), dtype=np.int64)
+    tails = np.repeat(np.arange(num_nodes, dtype=np.int32), np.diff(g.indptr))
+    arrays = {
+        "num_nodes": np.array(num_nodes),
+        "tails": tails[order],
+        "heads": g.indices[order].astype(np.int32),
+        "balance": g.balance[order].astype(np.int64),
+        "honest": np.array([G.nodes[n]['honest'] for n in range(num_nodes)], dtype=bool),
+    }
+
+    store = G.graph.get('ratings')
+    if store is not None and not store.sparse:
+        kind = "dense"
+        arrays["rating_score"] = store.score
+        arrays["rating_rated"] = store.rated
+    else:
+        if store is not None:
+            kind = "sparse"
+            rows = [(store.rows[n], store.data[n]) for n in range(num_nodes)]
+        elif 'rating' in G.nodes[0]:
+            kind = "dict"
+            rows = [(list(G.nodes[n]['rating']), list(G.nodes[n]['rating'].values())) for n in range(num_nodes)]
+        else:
+            kind = "none"
+            rows = []
+        if rows:
+            arrays["rating_indptr"] = np.cumsum([0] + [len(nodes) for nodes, _ in rows], dtype=np.int64)
+            arrays["rating_indices"] = np.fromiter((x for nodes, _ in rows for x in nodes), dtype=np.int32)
+            arrays["rating_data"] = np.fromiter((x for _, scores in rows for x in scores), dtype=np.int32)
+    if store is not None:
+        arrays["rating_dirty"] = np.array(sorted(store.dirty), dtype=np.int32)
+    arrays["rating_kind"] = np.array(RATING_KINDS.index(kind))
+    np.savez(path, **arrays)
+
+
+# Members of an uncompressed .npz as copy-on-write memory maps
+def _mmap_npz(path):
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be memory-mapped")
+            # local file header: 30 bytes + file name + extra field, then the .npy file
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            start = info.header_offset + 30 + int(name_length) + int(extra_length)
+            f.seek(start)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+            name = info.filename[:-len(".npy")]
+            if int(np.prod(shape)) <= 1:
+                f.seek(start)  # scalars and empty arrays are read, there is nothing to map
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(f, dtype=dtype, mode="c", offset=offset, shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+# The networkx graph of a snapshot, with its rating store or rating dicts
+def load_snapshot(path, mmap=True):
+    if mmap:
+        arrays = _mmap_npz(path)
+    else:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    num_nodes = int(arrays["num_nodes"])
+    kind = RATING_KINDS[int(arrays["rating_kind"])]
+
+    G = nx.DiGraph()
+    honest = arrays["honest"].tolist()
+    if kind == "dict":
+        indptr = arrays["rating_indptr"].tolist()
+        indices, data = arrays["rating_indices"].tolist(), arrays["rating_data"].tolist()
+        G.add_nodes_from((n, {'honest': honest[n], 'rating': dict(zip(indices[indptr[n]:indptr[n + 1]],
+                                                                       data[indptr[n]:indptr[n + 1]]))})
+                         for n in range(num_nodes))
+    else:
+        G.add_nodes_from((n, {'honest': honest[n]}) for n in range(num_nodes))
+    G.add_edges_from(zip(arrays["tails"].tolist(), arrays["heads"].tolist(),
+                         ({'balance': b} for b in arrays["balance"].tolist())))
+
+    if kind in ("dense", "sparse"):
+        store = Rating_Store.RatingStore.__new__(Rating_Store.RatingStore)
+        store.num_nodes = num_nodes
+        store.sparse = kind == "sparse"
+        if store.sparse:
+            store.matrix = Rating_Store.scipy.sparse.lil_matrix((num_nodes, num_nodes), dtype=Rating_Store.SCORE_DTYPE)
+            store.rows, store.data = store.matrix.rows, store.matrix.data
+            indptr = arrays["rating_indptr"].tolist()
+            indices, data = arrays["rating_indices"].tolist(), arrays["rating_data"].tolist()
+            for n in range(num_nodes):
+                store.rows[n] = indices[indptr[n]:indptr[n + 1]]
+                store.data[n] = data[indptr[n]:indptr[n + 1]]
+        else:
+            store.score = arrays["rating_score"].astype(Rating_Store.SCORE_DTYPE)  # snapshots from int16 stores too
+            store.rated = arrays["rating_rated"]
+        store.dirty = set(arrays["rating_dirty"].tolist())
+        store.rounds = 0
+        store.nodes_processed = 0
+        store.adopted = 0
+        G.graph['ratings'] = store
+    return G
+
+
+# Continuing the payments on the restored graph gives the same results as on the original
+def check_restore(strategy="mpc_rating", rating_store="dense", warmup=2000, payments=2000, seed=0, path=None):
+    import os
+    import tempfile
+    params = PCN_Sim.SimParams(transactions=warmup, rating_store=rating_store)
+    random.seed(seed)
+    G = PCN_Sim.create_pcn(params, ratings=strategy in ("rating", "mpc_rating"))
+    PCN_Sim.make_malicious(G, 0.2)
+    PCN_Sim.run_payments(G, strategy, params, PCN_Sim.random_payments(G.number_of_nodes(), params))
+    path = path or os.path.join(tempfile.mkdtemp(), "snapshot.npz")
+    save_snapshot(G, path)
+    restored = load_snapshot(path)
+
+    # prepared MPC tables draw from `random` when built, so both runs start with cold caches
+    G.graph.pop('prepared_tables', None)
+    G.graph.pop('liquidity_cache', None)
+    params = PCN_Sim.SimParams(transactions=payments, rating_store=rating_store)
+    results = []
+    for graph in (G, restored):
+        random.seed(seed + 1)
+        results.append(PCN_Sim.run_payments(graph, strategy, params, PCN_Sim.random_payments(G.number_of_nodes(), params)))
+    same_balances = all(G[u][v]['balance'] == restored[u][v]['balance'] for u, v in G.edges())
+    same_ratings = all(PCN_Sim.ratings_of(G, n) == PCN_Sim.ratings_of(restored, n) for n in G) \
+        if strategy in ("rating", "mpc_rating") else True
+    return results[0] == results[1] and same_balances and same_ratings
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    for strategy, rating_store in (("baseline", "dense"), ("mpc", "dense"), ("rating", "dict"),
+                                   ("rating", "dense"), ("mpc_rating", "sparse")):
+        print(f"{strategy:>10} ({rating_store}): restored run identical: {check_restore(strategy, rating_store)}")
+
+    # Warm-up reuse at the Nodes.csv scale: generate + warm up once, restore for every experiment
+    params = PCN_Sim.SimParams(topology="lightning", rating_store="sparse", transactions=5000)
+    random.seed(0)
+    start = time.perf_counter()
+    G = PCN_Sim.create_pcn(params, ratings=True)
+    PCN_Sim.make_malicious(G, 0.1)
+    PCN_Sim.run_payments(G, "rating", params, PCN_Sim.random_payments(G.number_of_nodes(), params))
+    build_time = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), "lightning.npz")
+    start = time.perf_counter()
+    save_snapshot(G, path)
+    save_time = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = load_snapshot(path)
+    restore_time = time.perf_counter() - start
+    print(f"{G.number_of_nodes()} nodes, {G.number_of_edges()} channels: generate + warm-up {build_time:.2f} s,"
+          f" save {save_time:.2f} s ({os.path.getsize(path) / 1e6:.1f} MB), restore {restore_time:.2f} s")
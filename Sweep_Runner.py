@@ -0,0 +1,168 @@
+import dataclasses
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import scipy.stats
+import PCN
+import PCN_MPC_RATING
+import PCN_RATING
+import PCN_Sim
+import PNC_MPC
+
+# Runs the malicious-percentage sweep of the four simulations on a process pool
+#
+# Every (strategy, malicious percentage, seed) cell is an independent PCN_Sim.run_simulation
+# call with the PARAMS of the strategy's script (or one SimParams passed as params); workers only
+# import PCN_Sim and the scripts, which do no work at import time. Each cell reseeds `random` from (BASE_SEED, strategy, point, seed)
+# before building its network, so the results do not depend on the number of workers or on
+# which worker picks up which cell.
+
+# strategy -> name of the list its script prints
+STRATEGIES = {
+    "baseline": "success_rate_baseline",
+    "mpc": "success_rate_mpc",
+    "rating": "success_rate_rating",
+    "mpc_rating": "success_rate_mpc_rating",
+}
+# strategy -> the script whose PARAMS its cells run with
+SCRIPTS = {
+    "baseline": PCN,
+    "mpc": PNC_MPC,
+    "rating": PCN_RATING,
+    "mpc_rating": PCN_MPC_RATING,
+}
+BASE_SEED = 0
+NUM_POINTS = 13
+TRANSACTIONS = None # payments per cell, None keeps the params' transactions (the scripts run 10000)
+SEEDS = [0] # replicates per sweep point, the success rates are averaged over them
+WORKERS = None # None uses every core
+ROUTING = None # PCN_Sim.SimParams.routing, e.g. "capacity" or "widest" to sweep the oracle upper bounds; None keeps the params' routing
+# Adaptive replicates (run_adaptive_sweep): seeds are added to a sweep point until the confidence
+# interval of its mean success rate is at most +-TARGET_HALF_WIDTH percentage points
+ADAPTIVE = False
+TARGET_HALF_WIDTH = 1.0
+CONFIDENCE = 0.95
+MIN_SEEDS = 3
+MAX_SEEDS = 30
+
+
+# Same values as the scripts' loop (0, 0.025, 0.05, ... accumulated the same way)
+def malicious_percentages(num_points=NUM_POINTS, step=0.025):
+    percentages = []
+    percentage = 0
+    for _ in range(num_points):
+        percentages.append(percentage)
+        percentage += step
+    return percentages
+
+
+def cell_seed(strategy, point, seed, base_seed=BASE_SEED):
+    # random.Random(str) hashes the string with SHA-512, so this is stable across processes
+    return random.Random(f"{base_seed}:{strategy}:{point}:{seed}").getrandbits(64)
+
+
+# SimParams of a strategy's cells: params, or the PARAMS of the strategy's script, with the
+# transactions / routing overrides that are not None
+def strategy_params(strategy, params=None, transactions=TRANSACTIONS, routing=ROUTING):
+    if params is None:
+        params = SCRIPTS[strategy].PARAMS
+    overrides = {name: value for name, value in (("transactions", transactions), ("routing", routing)) if value is not None}
+    return dataclasses.replace(params, **overrides)
+
+
+def run_cell(cell):
+    strategy, point, malicious_percentage, seed, params, base_seed = cell
+    success_rate = PCN_Sim.run_simulation(strategy, malicious_percentage, params,
+                                          cell_seed(strategy, point, seed, base_seed), verbose=False)
+    return strategy, point, success_rate
+
+
+# Returns {strategy: [success rate per sweep point]}, averaged over seeds
+def run_sweep(strategies=tuple(STRATEGIES), num_points=NUM_POINTS, seeds=SEEDS, transactions=TRANSACTIONS,
+              workers=WORKERS, base_seed=BASE_SEED, routing=ROUTING, params=None):
+    percentages = malicious_percentages(num_points)
+    cell_params = {strategy: strategy_params(strategy, params, transactions, routing) for strategy in strategies}
+    cells = [(strategy, point, percentage, seed, cell_params[strategy], base_seed)
+             for strategy in strategies
+             for point, percentage in enumerate(percentages)
+             for seed in seeds]
+    rates = {strategy: [[] for _ in percentages] for strategy in strategies}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for strategy, point, success_rate in pool.map(run_cell, cells):
+            rates[strategy][point].append(success_rate)
+    return {strategy: [round(sum(point) / len(point), 1) for point in points] for strategy, points in rates.items()}
+
+
+# Streaming mean and variance (Welford), one replicate at a time
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else float('inf')
+
+    # Half width of the Student-t confidence interval of the mean
+    def half_width(self, confidence=CONFIDENCE):
+        if self.count < 2:
+            return float('inf')
+        return float(scipy.stats.t.ppf((1 + confidence) / 2, self.count - 1)) * math.sqrt(self.variance() / self.count)
+
+
+# Same sweep with a varying number of seeds per (strategy, point): every round runs one more
+# seed for the cells whose interval is still wider than target_half_width (min_seeds in the first
+# round), until max_seeds. Seed k of a cell is the same cell_seed as in run_sweep and cells are
+# added in seed order, so the result does not depend on the workers.
+# Returns {strategy: [RunningStats per sweep point]}
+def run_adaptive_sweep(strategies=tuple(STRATEGIES), num_points=NUM_POINTS, transactions=TRANSACTIONS,
+                       workers=WORKERS, base_seed=BASE_SEED, routing=ROUTING, target_half_width=TARGET_HALF_WIDTH,
+                       confidence=CONFIDENCE, min_seeds=MIN_SEEDS, max_seeds=MAX_SEEDS, params=None):
+    percentages = malicious_percentages(num_points)
+    cell_params = {strategy: strategy_params(strategy, params, transactions, routing) for strategy in strategies}
+    stats = {strategy: [RunningStats() for _ in percentages] for strategy in strategies}
+    open_cells = [(strategy, point) for strategy in strategies for point in range(num_points)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while open_cells:
+            cells = [(strategy, point, percentages[point], seed, cell_params[strategy], base_seed)
+                     for strategy, point in open_cells
+                     for seed in range(stats[strategy][point].count, max(min_seeds, stats[strategy][point].count + 1))]
+            for strategy, point, success_rate in pool.map(run_cell, cells):
+                stats[strategy][point].add(success_rate)
+            open_cells = [(strategy, point) for strategy, point in open_cells
+                          if stats[strategy][point].count < max_seeds
+                          and stats[strategy][point].half_width(confidence) > target_half_width]
+    return stats
+
+
+# RunningStats against the two-pass mean and variance
+def check_running_stats(samples=1000, seed=0):
+    import statistics
+    rng = random.Random(seed)
+    values = [rng.gauss(70, 5) for _ in range(samples)]
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    return math.isclose(stats.mean, statistics.mean(values)) and math.isclose(stats.variance(), statistics.variance(values))
+
+
+if __name__ == "__main__":
+    start = time.time()
+    if ADAPTIVE:
+        results = run_adaptive_sweep()
+        for strategy, points in results.items():
+            print(STRATEGIES[strategy] + "= ", [round(point.mean, 1) for point in points])
+            print("  +-", [round(point.half_width(), 1) for point in points], "seeds", [point.count for point in points])
+    else:
+        results = run_sweep()
+        for strategy, success_rates in results.items():
+            print(STRATEGIES[strategy] + "= ", success_rates)
+    print("Workers:", WORKERS or os.cpu_count(), "| Time taken:", time.time() - start, "seconds")
@@ -0,0 +1,199 @@
+import heapq
+import math
+import random
+import time
+
+# Hierarchical timer wheel for HTLC expiries
+#
+# Time is cut into ticks. Level 0 has one slot per tick for the next `slots` ticks, level 1
+# one slot per `slots` ticks, and so on; a timer goes to the level of the highest base-`slots`
+# digit in which its tick differs from the current tick, into the slot of that digit. When the
+# current tick reaches the start of a higher-level slot, the timers in it are moved down
+# (cascaded) to the lower levels. Scheduling and cancelling are O(1), and every timer is moved
+# at most `levels` times before it expires. Cancelled timers are only marked and dropped when
+# their slot comes up. Timers further away than slots ** levels ticks wait in an overflow list.
+# A timer never fires early: it fires on the first tick at or after its time. skip_to jumps
+# over ticks on which nothing would happen, so sparse timers cost O(slots * levels) per jump
+# instead of one step per tick.
+
+
+class TimerWheel:
+    def __init__(self, tick=0.01, slots=256, levels=4, start=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.start = start
+        self.current = 0  # ticks processed so far
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.pending = 0
+        self.cascaded = 0
+
+    # Time of the next tick to be processed
+    def next_time(self):
+        return self.start + (self.current + 1) * self.tick
+
+    # First tick after the current one and up to limit on which step has work: a non-empty slot
+    # of level 0, the start of a non-empty higher-level slot (cascade), or the next overflow
+    # round; None if there is none. Level k slots all come before the next slot of level k + 1,
+    # so the lowest level found wins.
+    def next_occupied(self, limit=math.inf):
+        slots, current = self.slots, self.current
+        for level in range(self.levels):
+            span = slots ** level
+            base = current // (span * slots) * slots
+            digit = current // span % slots
+            end = slots if limit == math.inf else min(slots, limit // span - base + 1)
+            ahead = list(map(bool, self.wheels[level][digit + 1:end]))
+            if True in ahead:
+                return (base + digit + 1 + ahead.index(True)) * span
+            if end < slots:
+                return None  # later slots and levels start after limit
+        span = slots ** self.levels
+        tick = (current // span + 1) * span
+        return tick if self.overflow and tick <= limit else None
+
+    # Jumps towards time now (math.inf: as far as possible) over ticks on which nothing happens,
+    # stopping just before the next tick with a pending timer. Slots holding only cancelled
+    # timers are stepped on the way, which drops them.
+    def skip_to(self, now):
+        target = math.floor((now - self.start) / self.tick) if now != math.inf else now
+        while target > self.current:
+            tick = self.next_occupied(target)
+            if tick is None:
+                if self.current < target < math.inf:
+                    self.current = target
+                return
+            if self.current < tick - 1:
+                self.current = tick - 1
+            if self.pending:
+                return
+            self.step()
+
+    # Returns a handle for cancel; the item comes back from advance/step when the timer fires
+    def schedule(self, at, item):
+        expiry = max(self.current + 1, math.ceil((at - self.start) / self.tick - 1e-9))
+        timer = [expiry, item, True]
+        self._place(timer)
+        self.pending += 1
+        return timer
+
+    def cancel(self, timer):
+        if timer[2]:
+            timer[2] = False
+            self.pending -= 1
+
+    def _place(self, timer):
+        expiry, slots = timer[0], self.slots
+        high, current = expiry // slots, self.current // slots
+        level = 0
+        while high != current:
+            level += 1
+            if level == self.levels:
+                self.overflow.append(timer)
+                return
+            high //= slots
+            current //= slots
+        self.wheels[level][expiry // slots ** level % slots].append(timer)
+
+    # Processes one tick, returns the items of the timers that fired on it
+    def step(self):
+        self.current += 1
+        current, slots = self.current, self.slots
+        if current % slots == 0:
+            # cascade the higher-level slots that start on this tick, highest level first
+            level = 1
+            while level < self.levels and current % slots ** level == 0:
+                level += 1
+            if level == self.levels and current % slots ** level == 0:
+                waiting, self.overflow = self.overflow, []
+                for timer in waiting:
+                    if timer[2]:
+                        self._place(timer)
+            for cascade_level in range(level - 1, 0, -1):
+                index = current // slots ** cascade_level % slots
+                bucket = self.wheels[cascade_level][index]
+                self.wheels[cascade_level][index] = []
+                for timer in bucket:
+                    if timer[2]:
+                        self.cascaded += 1
+                        self._place(timer)
+
+        index = current % slots
+        bucket = self.wheels[0][index]
+        if not bucket:
+            return []
+        self.wheels[0][index] = []
+        fired = []
+        for timer in bucket:
+            if timer[2]:
+                timer[2] = False
+                self.pending -= 1
+                fired.append(timer[1])
+        return fired
+
+    # Processes every tick up to time now, returns the items of the fired timers in order
+    def advance(self, now):
+        fired = []
+        while self.next_time() <= now + 1e-12:
+            fired.extend(self.step())
+        return fired
+
+
+# Randomized check against a heap: every timer fires on the first tick at or after its time,
+# cancelled timers never fire. skip: jump over empty ticks with skip_to between steps
+def check_against_heap(timers=20000, horizon=1000.0, tick=0.01, slots=16, levels=3, seed=0, skip=False):
+    rng = random.Random(seed)
+    wheel = TimerWheel(tick, slots, levels)
+    handles = []
+    for i in range(timers):
+        at = rng.uniform(0, horizon)
+        handles.append((at, i, wheel.schedule(at, i)))
+    cancelled = {i for _, i, handle in handles if rng.random() < 0.2}
+    for at, i, handle in handles:
+        if i in cancelled:
+            wheel.cancel(handle)
+    mismatches = 0
+    fired = 0
+    while wheel.pending:
+        if skip:
+            wheel.skip_to(math.inf)
+        now = wheel.next_time()
+        for i in wheel.step():
+            fired += 1
+            at = handles[i][0]
+            if i in cancelled or not (at <= now + 1e-9 and now - at < tick + 1e-9):
+                mismatches += 1
+    return mismatches + abs(fired - (timers - len(cancelled)))
+
+
+if __name__ == "__main__":
+    print("Timer mismatches against a heap:", check_against_heap(), "| skipping empty ticks:",
+          check_against_heap(skip=True), "| sparse timers:", check_against_heap(200, skip=True))
+
+    # A million pending HTLC expiries, half of them settled (cancelled) before they expire
+    count = 1000000
+    rng = random.Random(1)
+    times = [rng.uniform(0, 3600) for _ in range(count)]
+    cancel = [rng.random() < 0.5 for _ in range(count)]
+
+    start = time.perf_counter()
+    wheel = TimerWheel(tick=0.1)
+    handles = [wheel.schedule(at, i) for i, at in enumerate(times)]
+    for handle, settled in zip(handles, cancel):
+        if settled:
+            wheel.cancel(handle)
+    fired = len(wheel.advance(3600))
+    wheel_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    heap = [(at, i) for i, at in enumerate(times)]
+    heapq.heapify(heap)
+    live = [not settled for settled in cancel]  # heaps can only cancel lazily too
+    heap_fired = 0
+    while heap:
+        at, i = heapq.heappop(heap)
+        heap_fired += live[i]
+    heap_time = time.perf_counter() - start
+    print(f"{count} timers, {fired} fired: timer wheel {wheel_time:.2f} s, heap {heap_time:.2f} s,"
+          f" {wheel.cascaded / count:.2f} cascades per timer")
@@ -0,0 +1,99 @@
+import numpy as np
+import random
+import time
+import Lightning_Topology
+import PCN_Sim
+
+# Pre-drawn payment workloads and replayable traces
+#
+# The scripts draw sender, receiver and amount with random.randint inside the payment loop
+# (retrying until sender != receiver), so generation cost sits in the hot loop and every
+# strategy sees a different stream of payments. Here the whole stream is drawn at once with
+# NumPy into one structured array (sender, receiver, amount as int32):
+#   sender   uniform over the nodes
+#   receiver uniform over the other nodes: sender + an offset in [1, n-1], modulo n
+#   amount   uniform in [1, max_send_amount]
+# which is the same distribution as the scripts' loop. A workload is saved as a .npy trace and
+# opened again memory-mapped, so a trace much larger than memory can be replayed: it is read
+# PCN_Sim.WORKLOAD_CHUNK rows at a time.
+# PCN_Sim.run_simulation(..., workload=trace) replays it; replay runs every strategy on the
+# same network seed and the same trace.
+
+PAYMENT_DTYPE = np.dtype([("sender", np.int32), ("receiver", np.int32), ("amount", np.int32)])
+
+
+def generate_workload(num_nodes, transactions, max_send_amount, seed=None):
+    if seed is None:
+        seed = random.getrandbits(32)  # follow the scripts' random state
+    rng = np.random.default_rng(seed)
+    workload = np.empty(transactions, dtype=PAYMENT_DTYPE)
+    workload["sender"] = rng.integers(0, num_nodes, transactions)
+    workload["receiver"] = (workload["sender"] + rng.integers(1, num_nodes, transactions)) % num_nodes
+    workload["amount"] = rng.integers(1, max_send_amount + 1, transactions)
+    return workload
+
+
+# Nodes of the network create_pcn builds for params: the "lightning" topology has the Nodes.csv
+# nodes (or the lightning_nodes sampled from them), not num_nodes
+def network_nodes(params):
+    if params.topology == "lightning":
+        total = len(Lightning_Topology.load_node_stats()[0])
+        return total if params.lightning_nodes is None else min(params.lightning_nodes, total)
+    return params.num_nodes
+
+
+# Workload for a SimParams (transactions, max_send_amount) over num_nodes nodes, by default the
+# nodes of the network params builds (pass G.number_of_nodes() of an already built graph)
+def workload_for(params, seed=None, num_nodes=None):
+    if num_nodes is None:
+        num_nodes = network_nodes(params)
+    return generate_workload(num_nodes, params.transactions, params.max_send_amount, seed)
+
+
+def save_trace(path, workload):
+    np.save(path, np.asarray(workload, dtype=PAYMENT_DTYPE))
+
+
+# The trace memory-mapped read-only; rows are only read from disk when replayed
+def load_trace(path):
+    trace = np.load(path, mmap_mode="r")
+    if trace.dtype != PAYMENT_DTYPE:
+        raise ValueError(f"{path} is not a payment trace (dtype {trace.dtype})")
+    return trace
+
+
+# Success rate of every strategy on the same network (seed) and the same payments (trace)
+def replay(trace, malicious_percentage, params=None, seed=0, strategies=PCN_Sim.STRATEGIES, verbose=False):
+    if params is None:
+        params = PCN_Sim.SimParams()
+    # run_simulation checks the trace against the nodes of the network it builds
+    return {strategy: PCN_Sim.run_simulation(strategy, malicious_percentage, params, seed, verbose, workload=trace)
+            for strategy in strategies}
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    params = PCN_Sim.SimParams()
+    count = 1000000
+    start = time.perf_counter()
+    workload = generate_workload(params.num_nodes, count, params.max_send_amount, seed=0)
+    numpy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    random.seed(0)
+    for _ in PCN_Sim.random_payments(params.num_nodes, PCN_Sim.SimParams(transactions=count)):
+        pass
+    loop_time = time.perf_counter() - start
+    print(f"{count} payments: NumPy {numpy_time:.3f} s, randint loop {loop_time:.3f} s")
+    print("sender == receiver:", int((workload["sender"] == workload["receiver"]).sum()),
+          "| amounts", int(workload["amount"].min()), "-", int(workload["amount"].max()))
+
+    path = os.path.join(tempfile.mkdtemp(), "workload.npy")
+    save_trace(path, workload_for(PCN_Sim.SimParams(transactions=3000), seed=1))
+    trace = load_trace(path)
+    print(f"Trace {path}: {len(trace)} payments, {os.path.getsize(path)} bytes")
+    first = replay(trace, 0.2, params)
+    print("Replay, 20% malicious:", first)
+    print("Replay again identical:", replay(load_trace(path), 0.2, params) == first)
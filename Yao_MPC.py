@@ -4,6 +4,7 @@
 # Example usage
 import random
 import math
+import numpy as np
 
 # Shared transformation used by both parties
 def sharedFunction(x):
@@ -49,6 +50,150 @@ def Yao_Millionaires_Protocol(Intermediate_Node, Sender, Highest, randomNum, ran
     else:
         return False  # Sender is not richer
 
+
+# Same protocol as Yao_Millionaires_Protocol, but the encoded table, the +1 offset and
+# the tolerance match are done as NumPy array operations instead of a Python loop.
+# Returns exactly the same boolean for the same inputs (including randomNum1).
+def Yao_Millionaires_Protocol_numpy(Intermediate_Node, Sender, Highest, randomNum, randomNum1=None):
+    if randomNum1 is None:
+        randomNum1 = random.randint(1, 500)
+    masked_value = Inverse(randomNum, randomNum1) - Sender
+
+    # hidden = reverseInverse(masked_value + i) and transform = sharedFunction(hidden), for all i at once
+    hidden = (masked_value + np.arange(max(Highest, 0), dtype=np.float64)) * randomNum1
+    encoded_values = (hidden * 7919 + 42) % 982451653
+
+    # +1 from Intermediate_Node to Highest; a negative lowerBound behaves like the list
+    # indexing in the pure-Python version (the tail gets a second +1)
+    lowerBound = round(Intermediate_Node)
+    if lowerBound < 0 and lowerBound < Highest:
+        if -lowerBound > len(encoded_values):
+            raise IndexError("list index out of range")
+        encoded_values[lowerBound:] += 1
+        lowerBound = 0
+    encoded_values[lowerBound:] += 1
+    if len(encoded_values) == 0:
+        return False
+
+    checker = sharedFunction(randomNum) + 1
+    # math.isclose(val, checker, rel_tol=1e-9) element-wise
+    tolerance = 1e-9 * np.maximum(np.abs(encoded_values), abs(checker))
+    return bool(np.any(np.abs(encoded_values - checker) <= tolerance))
+
+
+# Prepared comparison: the balance holder (Sender) builds the masked/encoded table once
+# per (balance, randomNum1) and can then answer many Intermediate_Node amounts.
+# Only the +1 shift depends on the amount, so we keep, for the unshifted and the shifted
+# table, where the checker matches; a comparison is then two integer tests.
+class PreparedComparison:
+    def __init__(self, Sender, Highest, randomNum, randomNum1=None):
+        if randomNum1 is None:
+            randomNum1 = random.randint(1, 500)
+        self.Sender = Sender
+        self.Highest = Highest
+        self.randomNum = randomNum
+        self.randomNum1 = randomNum1
+
+        masked_value = Inverse(randomNum, randomNum1) - Sender
+        hidden = (masked_value + np.arange(max(Highest, 0), dtype=np.float64)) * randomNum1
+        encoded_values = (hidden * 7919 + 42) % 982451653
+        checker = sharedFunction(randomNum) + 1
+
+        def matches(values):
+            tolerance = 1e-9 * np.maximum(np.abs(values), abs(checker))
+            return np.flatnonzero(np.abs(values - checker) <= tolerance)
+
+        plain = matches(encoded_values)  # indices below lowerBound (no +1)
+        shifted = matches(encoded_values + 1)  # indices from lowerBound to Highest (+1)
+        self.first_plain = int(plain[0]) if len(plain) else math.inf  # no match is below any bound
+        self.last_shifted = int(shifted[-1]) if len(shifted) else -1
+
+    # Same answer as Yao_Millionaires_Protocol(Intermediate_Node, Sender, Highest, randomNum, randomNum1)
+    def compare(self, Intermediate_Node):
+        lowerBound = round(Intermediate_Node)
+        if lowerBound < 0:
+            # negative bounds wrap around like list indexing, use the one-shot protocol
+            return Yao_Millionaires_Protocol_numpy(Intermediate_Node, self.Sender, self.Highest,
+                                                   self.randomNum, self.randomNum1)
+        return self.first_plain < lowerBound or self.last_shifted >= lowerBound
+
+    # Answers a whole vector of amounts in one call, returns a boolean array
+    def compare_batch(self, amounts):
+        lowerBounds = np.round(np.asarray(amounts, dtype=np.float64)).astype(np.int64)
+        result = (self.first_plain < lowerBounds) | (self.last_shifted >= lowerBounds)
+        for i in np.flatnonzero(lowerBounds < 0):
+            result[i] = self.compare(amounts[i])
+        return result
+
+
+# Per-edge store of prepared comparisons, held by the balance holders.
+# invalidate() must be called whenever the balance behind a key changes
+# (simulate_htlc_payment does it for every edge on the payment path).
+class PreparedComparisonStore:
+    def __init__(self, max_balance, randomNum=40):
+        self.max_balance = max_balance
+        self.randomNum = randomNum
+        self.tables = {}
+        self.builds = 0
+        self.queries = 0
+
+    def get(self, key, balance):
+        self.queries += 1
+        prepared = self.tables.get(key)
+        if prepared is None:
+            # the third parameter of the protocol is set above the balance, as in the scripts
+            prepared = PreparedComparison(balance, self.max_balance + balance, self.randomNum)
+            self.tables[key] = prepared
+            self.builds += 1
+        return prepared
+
+    def invalidate(self, key):
+        self.tables.pop(key, None)
+
+    # Invalidates both directions of every hop on a payment path
+    def invalidate_path(self, path):
+        for u, v in zip(path, path[1:]):
+            self.tables.pop((u, v), None)
+            self.tables.pop((v, u), None)
+
+
+# Engines selectable by name, e.g. Yao_MPC.get_engine("numpy")
+ENGINES = {
+    "python": Yao_Millionaires_Protocol,
+    "numpy": Yao_Millionaires_Protocol_numpy,
+}
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown MPC engine {name!r}, expected one of {sorted(ENGINES)}")
+    return ENGINES[name]
+
+
+# Randomized equivalence check of the NumPy engine and PreparedComparison against the pure-Python engine.
+# Uses the same argument shapes as the simulations: (send_amount, bal, MAX_CHANNEL_BALANCE+bal, 40),
+# and in a third of the trials a Highest around the amount, so that amount > Highest and
+# Highest <= 0 are covered too
+def check_engines_equivalent(trials=2000, max_balance=1000, max_amount=100, seed=0):
+    rng = random.Random(seed)
+    mismatches = []
+    for _ in range(trials):
+        amount = rng.randint(1, max_amount)
+        bal = rng.randint(-max_amount, max_balance)  # balances can go negative after refunds
+        highest = max_balance + bal
+        if rng.random() < 1 / 3:
+            highest = rng.randint(-max_amount, max_amount)
+            bal = rng.randint(-max_balance, max(highest, 0))
+        randomNum = rng.choice([40, rng.randint(1, 1000)])
+        randomNum1 = rng.randint(1, 500)
+        expected = Yao_Millionaires_Protocol(amount, bal, highest, randomNum, randomNum1)
+        actual = Yao_Millionaires_Protocol_numpy(amount, bal, highest, randomNum, randomNum1)
+        table = PreparedComparison(bal, highest, randomNum, randomNum1)
+        prepared = table.compare(amount)
+        if expected != actual or expected != prepared or expected != table.compare_batch([amount])[0]:
+            mismatches.append((amount, bal, highest, randomNum, randomNum1, expected, actual, prepared))
+    return mismatches
+
+
 #Highest should always set to value greater than the value of Sender
 # Run multiple times with the same parameters
 # for i in range(10):
@@ -145,3 +290,9 @@ def Yao_Millionaires_Protocol(Intermediate_Node, Sender, Highest, randomNum, ran
 
 # # https://www.youtube.com/watch?v=gf4BawfCY1A
 
+
+if __name__ == "__main__":
+    mismatches = check_engines_equivalent()
+    print("Mismatches against the python engine:", len(mismatches))
+    for case in mismatches[:10]:
+        print(case)